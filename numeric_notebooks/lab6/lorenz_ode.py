@@ -124,3 +124,28 @@ display(fig)
 # %%
 from IPython.display import Video
 Video(filename)
+
+# %% [markdown]
+# # Streaming the animation
+#
+# The animation above slices `xi[:i]` from the precomputed `x_t` on every
+# frame, so the work per frame grows with the frame number.
+# `numlabs.lab6.lorenz.LorenzAnimator` instead integrates each frame as it
+# is drawn (in a background thread) and appends just the new points to
+# preallocated line buffers.  With `window=200` only the last 200 points
+# of each trajectory are kept and drawn.
+
+# %%
+import context
+from numlabs.lab6 import lorenz
+
+fig = plt.figure()
+ax = fig.add_axes([0, 0, 1, 1], projection='3d')
+ax.axis('off')
+ax.set_xlim((-25, 25))
+ax.set_ylim((-35, 35))
+ax.set_zlim((5, 55))
+animator = lorenz.LorenzAnimator(ax, x0, dt=t[1] - t[0], window=200)
+anim = animator.animate(fig, frames=500)
+anim.save('lorentz_window.mp4', fps=15, extra_args=['-vcodec', 'libx264'])
+Video('lorentz_window.mp4')
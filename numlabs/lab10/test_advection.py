@@ -0,0 +1,166 @@
+"""
+To run:
+
+pytest numlabs/lab10/test_advection.py
+
+Regression tests for the Bott scheme in advection_funs.py: stored values
+of the Gaussian after 200 steps, the error against the exactly translated
+Gaussian, mass conservation, agreement with the original loop version,
+and the coefficient tables against lagrange_table; and for the
+dimension-split steppers in 2-D and 3-D, agreement with the 1-D steps,
+threaded against serial runs, and mass conservation.
+"""
+
+from numpy.testing import assert_allclose
+import numpy as np
+import pytest
+
+from numlabs.lab10 import advection_funs
+
+timesteps = 200
+
+# concentrations at points 120, 140, 148 (the peak), 156 and 176 after
+# timesteps steps of the lab's default Gaussian
+reference = {
+    2: [5.0473089166004376e-05, 0.5296287254017169, 0.9950197990614169,
+        0.5295825399206376, 0.00035426060787748333],
+    4: [6.424319729302487e-05, 0.5274744819744529, 0.9990963819644739,
+        0.5274680775140286, 0.00047109469936017456],
+}
+
+# largest allowed difference from the exact solution after timesteps steps
+max_error = {2: 6.e-3, 4: 1.e-3}
+
+
+def run_bott(order, loop=False):
+    dx, u, dt, Numpoints, shift, c_0, alpha, epsilon, cmatrix = \
+        advection_funs.initialize(timesteps)
+    ltable = advection_funs.advect3_gettable(order, Numpoints)
+    cmatrix = advection_funs.step_advect3(timesteps, ltable, cmatrix, order,
+                                          Numpoints, u, dt, dx, epsilon,
+                                          loop=loop)
+    return cmatrix, Numpoints, u, dt, dx, shift, c_0, alpha
+
+
+@pytest.mark.parametrize('order', [2, 4])
+def test_reference(order):
+    """
+    the final concentrations match the stored values
+    """
+    cmatrix, Numpoints = run_bott(order)[:2]
+    c = cmatrix[-1, 2:Numpoints+2]
+    assert_allclose(c[[120, 140, 148, 156, 176]], reference[order],
+                    rtol=1.e-10)
+
+
+@pytest.mark.parametrize('order', [2, 4])
+def test_exact(order):
+    """
+    the Gaussian is moved u*dt*timesteps to within max_error
+    """
+    cmatrix, Numpoints, u, dt, dx, shift, c_0, alpha = run_bott(order)
+    x = np.arange(Numpoints) * dx
+    exact = c_0 * np.exp(-alpha * (x - shift - u*dt*timesteps)**2)
+    error = np.abs(cmatrix[-1, 2:Numpoints+2] - exact).max()
+    assert error < max_error[order]
+
+
+@pytest.mark.parametrize('order', range(5))
+def test_mass(order):
+    """
+    the Bott scheme conserves the total mass on the periodic domain
+    """
+    cmatrix, Numpoints = run_bott(order)[:2]
+    mass = cmatrix[:, 2:Numpoints+2].sum(axis=1)
+    assert_allclose(mass, mass[0], rtol=1.e-13)
+
+
+@pytest.mark.parametrize('order', range(5))
+def test_loop(order):
+    """
+    the vectorized step_advect3 matches step_advect3_loop
+    """
+    vector = run_bott(order)[0]
+    loop = run_bott(order, loop=True)[0]
+    assert_allclose(vector, loop, rtol=0, atol=1.e-13)
+
+
+@pytest.mark.parametrize('order', range(5))
+def test_tables(order):
+    """
+    the coefficient tables agree with the calculated Lagrange coefficients
+    """
+    assert_allclose(advection_funs.bott_table(order),
+                    advection_funs.lagrange_table(order), rtol=0, atol=1.e-8)
+
+
+def run_split(step, cinit, nsteps=40):
+    for timecount, level in advection_funs.stream_advect(step, cinit, nsteps,
+                                                         [nsteps]):
+        result = level.copy()
+    return result
+
+
+def split_mass(c):
+    """
+    the total over the periodic domain, where point 2 is the same as
+    point Numpoints+1, so it is left out along each axis
+    """
+    return c[tuple(slice(3, n - 2) for n in c.shape)].sum()
+
+
+@pytest.mark.parametrize('scheme', ['bott', 'upstream'])
+def test_split_1d(scheme):
+    """
+    with no flow across the rows, a 2-D run advects every row exactly as
+    the 1-D step does
+    """
+    Numpoints = (30, 60)
+    cinit = advection_funs.initial_field(Numpoints)
+    with advection_funs.make_split_stepper(cinit.shape, (0., 0.45),
+                                           scheme) as step:
+        split = run_split(step, cinit)
+    if scheme == 'bott':
+        row_step = advection_funs.make_stepper('bott', Numpoints[1], 1., 0.45,
+                                               1., epsilon=0.0001, order=2)
+    else:
+        def row_step(cold, cnew):
+            advection_funs.upstream_periodic_step(cold, cnew, Numpoints[1],
+                                                  0.45, 1., 1.)
+    rows = run_split(row_step, cinit)
+    assert np.array_equal(split, rows)
+
+
+@pytest.mark.parametrize('shape', [(40, 50), (16, 20, 24)])
+def test_split_threads(shape):
+    """
+    the threaded stepper gives exactly the serial answer, and shuts its
+    pool down at the end of the with statement
+    """
+    cinit = advection_funs.initial_field(shape)
+    courant = [0.2, 0.45, 0.3][:len(shape)]
+    serial = run_split(advection_funs.make_split_stepper(cinit.shape, courant),
+                       cinit)
+    with advection_funs.make_split_stepper(cinit.shape, courant,
+                                           nthreads=3) as step:
+        threaded = run_split(step, cinit)
+    assert step.pool is None
+    assert np.array_equal(threaded, serial)
+
+
+@pytest.mark.parametrize('shape', [(40, 50), (16, 20, 24)])
+@pytest.mark.parametrize('scheme', ['bott', 'upstream'])
+def test_split_mass(shape, scheme):
+    """
+    the split steps conserve the total mass in 2-D and 3-D
+    """
+    cinit = advection_funs.initial_field(shape)
+    courant = [0.2, 0.45, 0.3][:len(shape)]
+    step = advection_funs.make_split_stepper(cinit.shape, courant, scheme)
+    result = run_split(step, cinit)
+    assert_allclose(split_mass(result), split_mass(cinit), rtol=1.e-13)
+
+
+if __name__ == "__main__":
+    print('testing __file__: {}'.format(__file__))
+    pytest.main([__file__, '-vv'])
@@ -1,7 +1,65 @@
+import copy
+import functools
 import numpy as np
+import time
+from scipy.linalg import lu_factor, lu_solve
+from scipy.optimize import brentq
 import yaml
 from collections import namedtuple
+from pathlib import Path
+from numlabs.lab6 import lorenz
 
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# the C version of the yaml loader is much faster, if libyaml is installed
+Loader = getattr(yaml, 'CFullLoader', yaml.FullLoader)
+
+@functools.lru_cache(maxsize=64)
+def load_config(filename, mtime):
+    """
+    parse a yaml file; cached on the file name and modification time, so
+    the file is only read again if it changes
+    """
+    with open(filename, 'rb') as f:
+        return yaml.load(f, Loader=Loader)
+
+
+def read_config(coeffFileName):
+    """
+    return a copy of the configuration in the yaml file coeffFileName,
+    or of coeffFileName itself if it's already a dictionary, that the
+    caller is free to change
+    """
+    if isinstance(coeffFileName, dict):
+        config = coeffFileName
+    else:
+        path = Path(coeffFileName).resolve()
+        config = load_config(str(path), path.stat().st_mtime_ns)
+    # the sections are flat dictionaries, so copy them directly
+    return {key: dict(value) if isinstance(value, dict) else
+            copy.deepcopy(value) for key, value in config.items()}
+
+
+@functools.lru_cache(maxsize=None)
+def namedtuple_type(typename, fields):
+    """
+    the namedtuple class for typename and the tuple of field names,
+    made once and then reused
+    """
+    return namedtuple(typename, fields)
+
+
+def make_namedtuple(typename, values):
+    """
+    a namedtuple instance holding the dictionary values
+    """
+    return namedtuple_type(typename, tuple(values.keys()))(**values)
+
+
+@functools.lru_cache(maxsize=None)
 def rkck_init():
     # %
     # % initialize the Cash-Karp coefficients
@@ -15,7 +73,7 @@ def rkck_init():
   # c2=c* coefficients for the fourth order schme
     c2 = np.array([2825.0 / 27648.0, 0.0, 18575.0 / 48384.0,
                    13525.0 / 55296.0, 277.0 / 14336.0, .25])
-    b = np.empty([5, 5], 'float')
+    b = np.zeros([5, 5], 'float')
   # the following line is ci - ci* in lab4, \Delta_est equationl
   # this is used to calculate \Delta_est = estError for the embededd
   # Runge Kutta  \sum_^6 (c_i -c_i^*)
@@ -40,6 +98,127 @@ def rkck_init():
     return (a, c1, c2, b)
 
 
+class OutputBuffer:
+    """
+    Collect rows of output, e.g. the state vector at each timestep,
+    without building a python list.  In memory the rows go into a
+    preallocated array that doubles in size when it fills up.  With a
+    filename, rows are kept in a block of size rows that is appended to
+    the file whenever it fills up, and values() returns a read-only
+    np.memmap of the raw (float64 by default) file, so the output can be
+    much larger than memory.
+    """
+
+    def __init__(self, shape=(), dtype='float', size=1024, filename=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.filename = filename
+        self.buffer = np.empty((max(int(size), 1),) + self.shape, self.dtype)
+        # rows in self.buffer, and rows already written to the file
+        self.nrows = 0
+        self.nwritten = 0
+        if filename is not None:
+            self.outfile = open(filename, 'wb')
+
+    def append(self, row):
+        if self.nrows == len(self.buffer):
+            if self.filename is None:
+                bigger = np.empty((2 * len(self.buffer),) + self.shape,
+                                  self.dtype)
+                bigger[:self.nrows] = self.buffer
+                self.buffer = bigger
+            else:
+                self.flush()
+        self.buffer[self.nrows] = row
+        self.nrows += 1
+
+    def flush(self):
+        if self.filename is not None and self.nrows > 0:
+            self.buffer[:self.nrows].tofile(self.outfile)
+            self.nwritten += self.nrows
+            self.nrows = 0
+
+    def close(self):
+        """
+        write out the rows still in the block and close the file; safe
+        to call more than once, and a no-op for in memory buffers
+        """
+        if self.filename is not None and not self.outfile.closed:
+            self.flush()
+            self.outfile.close()
+
+    def __len__(self):
+        return self.nwritten + self.nrows
+
+    def values(self):
+        """
+        the rows appended so far, as a view of the in memory buffer or
+        a memmap of the file (which is closed by the call)
+        """
+        if self.filename is None:
+            return self.buffer[:self.nrows]
+        self.close()
+        if self.nwritten == 0:
+            return np.empty((0,) + self.shape, self.dtype)
+        return np.memmap(self.filename, dtype=self.dtype, mode='r',
+                         shape=(self.nwritten,) + self.shape)
+
+
+class DenseOutput:
+    """
+    Continuous output for an adaptive run: a cubic Hermite interpolant
+    on each accepted step, built from the values and slopes at both
+    ends of the step.  The slope at the start of a step is the first
+    Cash-Karp stage k1, so apart from the slope at the very end no
+    extra derivative evaluations are needed.  The interpolant is
+    accurate to 4th order in dt, a little less than the 5th order steps.
+
+    times: (nsteps + 1,) step boundaries
+    yvals, slopes: (nsteps + 1, ...) values and dy/dt at those times
+
+    calling the object with an array of times between times[0] and
+    times[-1] returns the interpolated values, shaped
+    (len(times),) + yvals.shape[1:]
+    """
+
+    def __init__(self, times, yvals, slopes):
+        self.times = np.asarray(times)
+        self.yvals = np.asarray(yvals)
+        self.slopes = np.asarray(slopes)
+
+    def __call__(self, times):
+        times = np.asarray(times, dtype='float')
+        # the step that holds each requested time
+        step = np.searchsorted(self.times, times, side='right') - 1
+        step = np.clip(step, 0, len(self.times) - 2)
+        t0 = self.times[step]
+        dt = self.times[step + 1] - t0
+        # reshape so the weights broadcast against the state vectors
+        extra = (np.newaxis,) * (self.yvals.ndim - 1)
+        dt = dt[(...,) + extra]
+        theta = (times - t0)[(...,) + extra] / dt
+        # cubic Hermite basis functions on 0 <= theta <= 1
+        h00 = (1.0 + 2.0 * theta) * (1.0 - theta)**2.0
+        h10 = theta * (1.0 - theta)**2.0
+        h01 = theta**2.0 * (3.0 - 2.0 * theta)
+        h11 = theta**2.0 * (theta - 1.0)
+        return (h00 * self.yvals[step] + h10 * dt * self.slopes[step] +
+                h01 * self.yvals[step + 1] + h11 * dt * self.slopes[step + 1])
+
+
+def event(func, terminal=False, direction=0):
+    """
+    mark func(t, y) as an event function for Integrator.timeloop5Err:
+    an event happens where func changes sign.  direction=1 only counts
+    crossings from negative to positive, -1 only positive to negative,
+    and terminal=True stops the integration at the first event, e.g.
+    event(lambda t, y: y[0]) records every time x crosses 0
+    """
+    func.terminal = terminal
+    func.direction = direction
+    return func
+
+
 class Integrator:
     """
     Base class that holds most of the code for the RK integration
@@ -47,21 +226,53 @@ class Integrator:
     initialization routines
     """
 
+    # the right hand side as a function derivs(y, t, params) that numba
+    # can compile, and the uservars packed into params, in order; set
+    # these in the derived class to use timeloop5Err_numba
+    numba_derivs = None
+    numba_params = ()
+
     def set_yinit(self):
         raise ValueError(
             'set_init needs to be overridden in the derived class')
 
     def __init__(self, coeffFileName):
-        with open(coeffFileName, 'rb') as f:
-            config = yaml.load(f,Loader=yaml.FullLoader)
+        # coeffFileName is a yaml file, or a dictionary with the same
+        # sections, e.g. passed to the workers in a parameter sweep
+        config = read_config(coeffFileName)
         self.config = config
         # read in dt tstart tend
-        timevars = namedtuple('timevars',config['timevars'].keys())
-        self.timevars = timevars(**config['timevars'])
+        self.timevars = make_namedtuple('timevars', config['timevars'])
         # read in dtpassmin dtpassmax dtfailmin dtfailmax s rtol atol maxsteps maxfail
-        adaptvars = namedtuple('adaptvars', config['adaptvars'].keys())
-        self.adaptvars = adaptvars(**config['adaptvars'])
+        self.adaptvars = make_namedtuple('adaptvars', config['adaptvars'])
         self.rkckConsts = rkck_init()
+        # (6, nvars) array for the k values, allocated on the first step
+        self.derivArray = None
+        # adaptvars can set method: rosenbrock for stiff problems
+        self.set_method(config['adaptvars'].get('method', 'rkck'))
+
+    def set_method(self, method):
+        """
+        choose the stepper used by timeloop5Err and timeloop5fixed: 'rkck'
+        for the explicit Cash-Karp rkckODE5 (the default), or
+        'rosenbrock' for rosenbrockODE2, for stiff problems
+        """
+        if method == 'rkck':
+            self.stepper = self.rkckODE5
+            # exponent in lab5 equation 4.13, 1/(order of the error + 1)
+            self.errorPower = 0.2
+        elif method == 'rosenbrock':
+            self.stepper = self.rosenbrockODE2
+            self.errorPower = 0.5
+        else:
+            raise ValueError('unknown method {}, use rkck or '
+                             'rosenbrock'.format(method))
+        # Jacobian and LU factorization kept between rosenbrockODE2 steps
+        self.jac = None
+        self.jacAge = 0
+        self.luW = None
+        self.luStep = None
+        self.lastStart = None
 
     def __str__(self):
         out = 'integrator instance with attributes initvars, timevars,uservars, ' + \
@@ -77,6 +288,38 @@ class Integrator:
 
     def rkckODE5(self, yold, timeStep, deltaT):
 
+        # initialize the Cash-Karp coefficients
+        # defined in the tableau in lab 4,
+        # c1=c_i in lab 4 notation, but c2=c_i - c^*_i
+
+        a, c1, c2, b = self.rkckConsts
+        # reuse the array that holds the k values in lab4
+        derivArray = self.derivArray
+        if derivArray is None or derivArray.shape != (6,) + np.shape(yold):
+            derivArray = np.empty((6,) + np.shape(yold), 'float')
+            self.derivArray = derivArray
+        # vector k1 in lab4 equation 3.9
+        derivArray[0] = self.derivs5(yold, timeStep)
+
+        # vectors k2 through k6 in lab4: the sum over b[i, j]*k_j for
+        # j <= i is a row of the tableau times the k values found so far
+        for i in range(5):
+            derivArray[i + 1] = self.derivs5(
+                yold + deltaT * (b[i, :i + 1] @ derivArray[:i + 1]),
+                timeStep + a[i] * deltaT)
+        # final fifth order anser
+        y = yold + deltaT * (c1 @ derivArray)
+        # \Delta_est in lab4, the difference from the 4th order estimate
+        estError = deltaT * (c2 @ derivArray)
+        timeStep = timeStep + deltaT
+        return (y, estError, timeStep)
+
+    def rkckODE5_loop(self, yold, timeStep, deltaT):
+        """
+        the original version of rkckODE5, which sums the stages with
+        python loops; kept for comparison in benchmark_rkck
+        """
+
         # initialize the Cash-Karp coefficients
         # defined in the tableau in lab 4,
 
@@ -120,8 +363,89 @@ class Integrator:
 #       pdb.set_trace()
         return (y, estError, timeStep)
 
-    def timeloop5Err(self):
+    def jacobian(self, y, t):
+        """
+        finite difference estimate of the Jacobian d(derivs5)/dy used by
+        rosenbrockODE2; override this if you have the analytic Jacobian
+        """
+        f0 = self.derivs5(y, t)
+        y = np.asarray(y, dtype='float')
+        jac = np.empty((y.size, y.size), 'float')
+        for j in range(y.size):
+            dy = np.sqrt(np.finfo(float).eps) * max(abs(y[j]), 1.0)
+            ypert = y.copy()
+            ypert[j] = ypert[j] + dy
+            jac[:, j] = (self.derivs5(ypert, t) - f0) / dy
+        return jac
+
+    def rosenbrockODE2(self, yold, timeStep, deltaT):
+        """
+        one step of the linearly implicit Rosenbrock method ROS2
+        (Verwer et al., 1999, SIAM J. Sci. Comput. 20, 1456) for stiff
+        problems, with the same arguments and return values as rkckODE5:
+
+        (I - gamma dt J) k1 = f(t, y)
+        (I - gamma dt J) k2 = f(t + dt, y + dt k1) - 2 k1
+        ynew = y + dt (3 k1 + k2)/2
+
+        with gamma = 1 + 1/sqrt(2).  The error estimate is the difference
+        from the first order solution y + dt k1.  ROS2 is second order
+        for any approximation to J, so the Jacobian is only recomputed
+        after a failed step or every adaptvars.jacevery (default 20) steps,
+        and the LU factorization of I - gamma dt J is reused as long as dt
+        doesn't change.  The time derivative of f is neglected, which
+        doesn't matter for autonomous systems like daisyworld, Lorenz or
+        Van der Pol.
+        """
+        gamma = 1.0 + 1.0 / np.sqrt(2.0)
+        derivArray = self.derivArray
+        if derivArray is None or derivArray.shape != (6,) + np.shape(yold):
+            derivArray = np.empty((6,) + np.shape(yold), 'float')
+            self.derivArray = derivArray
+        # a second try from the same time means the last step failed,
+        # so get a fresh Jacobian
+        jacevery = getattr(self.adaptvars, 'jacevery', 20)
+        if timeStep == self.lastStart or self.jacAge >= jacevery:
+            self.jac = None
+        self.lastStart = timeStep
+        if self.jac is None:
+            self.jac = self.jacobian(yold, timeStep)
+            self.jacAge = 0
+            self.luW = None
+        if self.luW is None or deltaT != self.luStep:
+            W = np.eye(len(self.jac)) - gamma * deltaT * self.jac
+            self.luW = lu_factor(W)
+            self.luStep = deltaT
+        self.jacAge = self.jacAge + 1
+        # dy/dt at the start of the step, then k1 and k2
+        derivArray[0] = self.derivs5(yold, timeStep)
+        derivArray[1] = lu_solve(self.luW, derivArray[0])
+        derivArray[2] = lu_solve(
+            self.luW,
+            self.derivs5(yold + deltaT * derivArray[1], timeStep + deltaT) -
+            2.0 * derivArray[1])
+        y = yold + deltaT * (1.5 * derivArray[1] + 0.5 * derivArray[2])
+        estError = deltaT * (0.5 * derivArray[1] + 0.5 * derivArray[2])
+        timeStep = timeStep + deltaT
+        return (y, estError, timeStep)
+
+    def timeloop5Err(self, outdir=None, dense=False, events=None):
         """return errors as well as values
+
+           if outdir is given, the times, values and errors are streamed
+           to time.dat, y.dat and error.dat in that directory (see
+           OutputBuffer) and returned as memmaps
+
+           with dense=True the slope at the start of each step is kept
+           as well, and self.dense is set to a DenseOutput that gives
+           the solution at any time between tstart and tend, e.g.
+           theSolver.dense(np.linspace(tstart, tend, 1000))
+
+           events is a list of functions g(t, y), see event(); the
+           times and values where each g crosses zero are found from
+           the Hermite interpolant on the step and saved in
+           self.t_events and self.y_events, one array per function.
+           A terminal event ends the run at the event time.
         """
         t = self.timevars
         a = self.adaptvars
@@ -134,153 +458,476 @@ class Integrator:
         num = 0
         badsteps = 0
         goodsteps = 0
-        timeVals = []
-        yvals = []
-        errorList = []
-        while(oldTime < t.tend):
-            timeVals.append(oldTime)
-            yvals.append(yold)
-            errorList.append(yerror)
-            if(num > a.maxsteps):
-                raise Exception('num > maxsteps')
-            # start out with goodstep false and
-            # try different sizes for the next step
-            # until one meets the error conditions
-            # then move onto next step by setting
-            # goodstep to true
-            goodStep = False
-            failSteps = 0
-            while(not goodStep):
-                # to exit this loop, need to
-                # get the estimated error smaller than
-                # the desired error set by the relative
-                # tolerance
-                if(failSteps > a.maxfail):
-                    raise Exception('failSteps > a.maxfail')
-                #
-                # try a timestep, we may need to reverse this
-                #
-                ynew, yerror, timeStep = self.rkckODE5(yold, oldTime, olddt)
-                # print("try a step: : ", ynew)
-                #
-                # lab 5 section 4.2.3
-                # find the desired tolerance by multiplying the relative
-                # tolerance (RTOL) times the value of y
-                # compare this to the error estimate returnd from rkckODE5
-                # atol takes care of the possibility that y~0 at some point
-                #
-                errtest = 0.
-                for i in range(nvars):
-                    errtest = errtest + \
-                        (yerror[i] / (a.atol + a.rtol * np.abs(ynew[i])))**2.0
-                errtest = np.sqrt(errtest / nvars)
-                #
-                # lab5 equation 4.13, S
-                #
-                dtchange = a.s * (1.0 / errtest)**0.2
-                # print("dtchange, errtest, timeStep: ",
-                #       dtchange, errtest, timeStep, ynew, yerror)
-                if (errtest > 1.0):
-                    # estimated error is too big so
-                    # reduce the timestep and retry
-                    # dtFailMax ~ 0.5, which guarantees that
-                    # the new timestep is reduced by at least a
-                    # factor of 2
-                    # dtFailMin~0.1, which means that we don't trust
-                    # the estimate to reduce the timestep by more
-                    # than a factor of 10 in one loop
-                    if(dtchange > a.dtfailmax):
-                        olddt = a.dtfailmax * olddt
-                    elif (dtchange < a.dtfailmin):
-                        olddt = a.dtfailmin * olddt
-                    else:
-                        olddt = dtchange * olddt
-                    if (timeStep + olddt == timeStep):
-                        raise Exception('step smaller than machine precision')
-                    failSteps = failSteps + 1
+        timeVals, yvals, errorList = self.output_buffers(outdir)
+        buffers = [timeVals, yvals, errorList]
+        if dense:
+            slopefile = None if outdir is None else Path(outdir) / 'slope.dat'
+            slopes = OutputBuffer(np.shape(yold), filename=slopefile)
+            buffers.append(slopes)
+        events = list(events or [])
+        self.t_events = [[] for g in events]
+        self.y_events = [[] for g in events]
+        eventVals = [g(oldTime, yold) for g in events]
+        try:
+            while(oldTime < t.tend):
+                timeVals.append(oldTime)
+                yvals.append(yold)
+                errorList.append(yerror)
+                stepTime = oldTime
+                ystep = yold
+                if(num > a.maxsteps):
+                    raise Exception('num > maxsteps')
+                # start out with goodstep false and
+                # try different sizes for the next step
+                # until one meets the error conditions
+                # then move onto next step by setting
+                # goodstep to true
+                goodStep = False
+                failSteps = 0
+                while(not goodStep):
+                    # to exit this loop, need to
+                    # get the estimated error smaller than
+                    # the desired error set by the relative
+                    # tolerance
+                    if(failSteps > a.maxfail):
+                        raise Exception('failSteps > a.maxfail')
                     #
-                    # undo the timestep since the error wasn't small enough
+                    # try a timestep, we may need to reverse this
                     #
-                    ynew = yold
-                    timeStep = oldTime
-                    # go back to top and see if this olddt produices
-                    # a better yerrror
-                else:
-                    # errtest < 1, so we're happy
-                    # try to enlarge the timestep by a factor of dtChange > 1
-                    # but keep it smaller than dtpassmax
-                    # try enlarging the timestep bigger for next time
-                    # dtpassmin ~ 0.1 and dtpassmax ~ 5
-                    if (abs((1.0 - dtchange)) > a.dtpassmin):
-                        if(dtchange > a.dtpassmax):
-                            dtnew = a.dtpassmax * olddt
+                    ynew, yerror, timeStep = self.stepper(yold, oldTime, olddt)
+                    # print("try a step: : ", ynew)
+                    #
+                    # lab 5 section 4.2.3
+                    # find the desired tolerance by multiplying the relative
+                    # tolerance (RTOL) times the value of y
+                    # compare this to the error estimate returnd from rkckODE5
+                    # atol takes care of the possibility that y~0 at some point
+                    #
+                    errtest = np.sqrt(np.mean(
+                        (yerror / (a.atol + a.rtol * np.abs(ynew)))**2.0))
+                    #
+                    # lab5 equation 4.13, S
+                    #
+                    dtchange = a.s * (1.0 / errtest)**self.errorPower
+                    # print("dtchange, errtest, timeStep: ",
+                    #       dtchange, errtest, timeStep, ynew, yerror)
+                    if (errtest > 1.0):
+                        # estimated error is too big so
+                        # reduce the timestep and retry
+                        # dtFailMax ~ 0.5, which guarantees that
+                        # the new timestep is reduced by at least a
+                        # factor of 2
+                        # dtFailMin~0.1, which means that we don't trust
+                        # the estimate to reduce the timestep by more
+                        # than a factor of 10 in one loop
+                        if(dtchange > a.dtfailmax):
+                            olddt = a.dtfailmax * olddt
+                        elif (dtchange < a.dtfailmin):
+                            olddt = a.dtfailmin * olddt
                         else:
-                            dtnew = dtchange * olddt
+                            olddt = dtchange * olddt
+                        if (timeStep + olddt == timeStep):
+                            raise Exception('step smaller than machine precision')
+                        failSteps = failSteps + 1
+                        #
+                        # undo the timestep since the error wasn't small enough
+                        #
+                        ynew = yold
+                        timeStep = oldTime
+                        # go back to top and see if this olddt produices
+                        # a better yerrror
                     else:
-                        # don't bother changing the step size if
-                        # the change is less than dtpassmin
-                        dtnew = olddt
-                    goodStep = True
+                        # errtest < 1, so we're happy
+                        # try to enlarge the timestep by a factor of dtChange > 1
+                        # but keep it smaller than dtpassmax
+                        # try enlarging the timestep bigger for next time
+                        # dtpassmin ~ 0.1 and dtpassmax ~ 5
+                        if (abs((1.0 - dtchange)) > a.dtpassmin):
+                            if(dtchange > a.dtpassmax):
+                                dtnew = a.dtpassmax * olddt
+                            else:
+                                dtnew = dtchange * olddt
+                        else:
+                            # don't bother changing the step size if
+                            # the change is less than dtpassmin
+                            dtnew = olddt
+                        goodStep = True
+                        # the explicit runs in labs 5 and 6 have never counted
+                        # their steps against maxsteps, so only the stiff
+                        # method does
+                        if self.stepper == self.rosenbrockODE2:
+                            num = num + 1
+                        #
+                        # overwrite the old timestep with the new one
+                        #
+                        oldTime = timeStep
+                        yold = ynew
+                        # go back up to top while(timeStep < t.tend)
+                        goodsteps = goodsteps + 1
+                        if dense:
+                            # k1 of the accepted step is dy/dt at its start
+                            slopes.append(self.derivArray[0])
                     #
-                    # overwrite the old timestep with the new one
+                    # this is number of times we decreased the step size without
+                    #  advancing
                     #
-                    oldTime = timeStep
-                    yold = ynew
-                    # go back up to top while(timeStep < t.tend)
-                    goodsteps = goodsteps + 1
-                #
-                # this is number of times we decreased the step size without
-                #  advancing
-                #
-                badsteps = badsteps + failSteps
-            # special case if we're within one ortwo timesteps of the end
-            # otherwise, set dt to the new timestep size
-            if(timeStep + dtnew > t.tend):
-                olddt = t.tend - timeStep
-            elif(timeStep + 2.0 * dtnew > t.tend):
-                olddt = (t.tend - timeStep) / 2.0
-            else:
-                olddt = dtnew
-        timeVals = np.array(timeVals).squeeze()
-        yvals = np.array(yvals).squeeze()
-        errorVals = np.array(errorList).squeeze()
+                    badsteps = badsteps + failSteps
+                if events:
+                    stopTime, ystop = self.find_events(
+                        events, eventVals, stepTime, ystep, self.derivArray[0],
+                        oldTime, yold)
+                    if stopTime is not None:
+                        oldTime = stopTime
+                        yold = ystop
+                        break
+                # special case if we're within one ortwo timesteps of the end
+                # otherwise, set dt to the new timestep size
+                if(timeStep + dtnew > t.tend):
+                    olddt = t.tend - timeStep
+                elif(timeStep + 2.0 * dtnew > t.tend):
+                    olddt = (t.tend - timeStep) / 2.0
+                else:
+                    olddt = dtnew
+            if dense:
+                # close off the last step with the value and slope at tend
+                timeVals.append(oldTime)
+                yvals.append(yold)
+                slopes.append(self.derivs5(yold, oldTime))
+        finally:
+            # close the files even if a step fails
+            for buffer in buffers:
+                buffer.close()
+        if dense:
+            self.dense = DenseOutput(timeVals.values(), yvals.values(),
+                                     slopes.values())
+            timeVals = timeVals.values()[:-1].squeeze()
+            yvals = yvals.values()[:-1].squeeze()
+        else:
+            timeVals = timeVals.values().squeeze()
+            yvals = yvals.values().squeeze()
+        errorVals = errorList.values().squeeze()
+        self.t_events = [np.array(tvals) for tvals in self.t_events]
+        self.y_events = [np.array(yvals_event) for yvals_event in self.y_events]
+        self.goodsteps = goodsteps
+        self.badsteps = badsteps
         self.timevals = timeVals
         self.yvals = yvals
         self.errorVals = errorVals
         return (timeVals, yvals, errorVals)
 
-    def timeloop5fixed(self):
+    def timeloop5Err_numba(self):
+        """
+        timeloop5Err with numba: numba_derivs is compiled together with
+        the Cash-Karp stages and the step size control into one
+        function (see get_timeloop), so there are no python calls per
+        step.  Returns (timeVals, yvals, errorVals) as timeloop5Err
+        does.  For daisyworld they agree to round-off (test_lab5_funs.py
+        checks this), but in a chaotic system like Lorenz the round-off
+        differences grow, so the steps and the trajectory drift apart
+        (4677 steps against 4716 for lab6/lorenz.yaml).  timeloop5Err
+        stays the reference version, and the only one with dense output,
+        events, outdir and the rosenbrock method.
+        """
+        if numba is None:
+            raise ImportError('timeloop5Err_numba needs numba')
+        if self.numba_derivs is None:
+            raise ValueError('set numba_derivs and numba_params in the '
+                             'derived class to use timeloop5Err_numba')
+        if self.stepper != self.rkckODE5:
+            raise ValueError('timeloop5Err_numba only supports method: rkck')
+        t = self.timevars
+        a = self.adaptvars
+        params = np.array([getattr(self.uservars, name)
+                           for name in self.numba_params], 'float')
+        adapt = np.array([a.dtpassmin, a.dtpassmax, a.dtfailmin,
+                          a.dtfailmax, a.s, a.rtol, a.atol, a.maxfail],
+                         'float')
+        timeloop = get_timeloop(self.numba_derivs)
+        timeVals, yvals, errorVals, goodsteps, badsteps = timeloop(
+            np.array(self.yinit, 'float'), float(t.tstart), float(t.tend),
+            float(t.dt), params, adapt, *self.rkckConsts)
+        self.goodsteps = goodsteps
+        self.badsteps = badsteps
+        self.timevals = timeVals.squeeze()
+        self.yvals = yvals.squeeze()
+        self.errorVals = errorVals.squeeze()
+        return (self.timevals, self.yvals, self.errorVals)
+
+    def find_events(self, events, eventVals, t0, y0, f0, t1, y1):
+        """
+        check the event functions at the end of the step from (t0, y0)
+        to (t1, y1), where f0 is dy/dt at t0.  Zero crossings are located
+        with brentq on the Hermite interpolant of the step and added to
+        self.t_events and self.y_events, and eventVals is updated in
+        place to the values at t1.
+
+        returns (time, value) of the first terminal event in the step,
+        or (None, None)
+        """
+        found = []
+        step = None
+        for num, g in enumerate(events):
+            gold = eventVals[num]
+            gnew = g(t1, y1)
+            eventVals[num] = gnew
+            direction = getattr(g, 'direction', 0)
+            up = gold < 0.0 <= gnew and direction >= 0
+            down = gold > 0.0 >= gnew and direction <= 0
+            if not (up or down):
+                continue
+            if step is None:
+                # only pay for the slope at t1 if there is an event
+                step = DenseOutput([t0, t1], [y0, y1],
+                                   [f0, self.derivs5(y1, t1)])
+            tevent = brentq(lambda theTime: g(theTime, step(theTime)), t0,
+                            t1, xtol=4.0 * np.finfo(float).eps * abs(t1))
+            found.append((tevent, num, getattr(g, 'terminal', False)))
+        stopTime = None
+        ystop = None
+        # keep events in time order, and none after a terminal event
+        for tevent, num, terminal in sorted(found):
+            if stopTime is not None and tevent > stopTime:
+                break
+            yevent = step(tevent)
+            self.t_events[num].append(tevent)
+            self.y_events[num].append(yevent)
+            if terminal:
+                stopTime = tevent
+                ystop = yevent
+        return (stopTime, ystop)
+
+    def output_buffers(self, outdir=None, size=1024, times=True):
+        """
+        OutputBuffers for the times, values and errors of a run, in
+        memory or streamed to outdir; with times=False only the values
+        and errors
+        """
+        shape = np.shape(self.yinit)
+        if outdir is None:
+            files = (None, None, None)
+        else:
+            outdir = Path(outdir)
+            outdir.mkdir(parents=True, exist_ok=True)
+            files = [outdir / name for name in ('time.dat', 'y.dat',
+                                                'error.dat')]
+        buffers = (OutputBuffer(shape, size=size, filename=files[1]),
+                   OutputBuffer(shape, size=size, filename=files[2]))
+        if times:
+            buffers = (OutputBuffer((), size=size, filename=files[0]),) + buffers
+        return buffers
+
+    def timeloop5fixed(self, outdir=None):
         """fixed time step with
            estimated errors
+
+           the number of steps is known, so the values and errors go
+           into arrays of exactly that size, or into files in outdir as
+           for timeloop5Err; the times are returned as the array of
+           steps, so they aren't saved
         """
         t = self.timevars
         yold = self.yinit
         yError = np.zeros_like(yold)
-        yvals = [yold]
-        errorList = [yError]
         timeSteps = np.arange(t.tstart, t.tend, t.dt)
-        for theTime in timeSteps[:-1]:
-            yold, yError, newTime = self.rkckODE5(yold, theTime, t.dt)
-            #pdb.set_trace()
+        size = len(timeSteps)
+        if outdir is not None:
+            size = min(size, 1024)
+        yvals, errorList = self.output_buffers(outdir, size, times=False)
+        try:
             yvals.append(yold)
             errorList.append(yError)
-        yvals = np.array(yvals).squeeze()
-        errorVals = np.array(errorList).squeeze()
+            for theTime in timeSteps[:-1]:
+                yold, yError, newTime = self.stepper(yold, theTime, t.dt)
+                yvals.append(yold)
+                errorList.append(yError)
+        finally:
+            yvals.close()
+            errorList.close()
+        yvals = yvals.values().squeeze()
+        errorVals = errorList.values().squeeze()
         return (timeSteps, yvals, errorVals)
 
+#
+# right hand sides for timeloop5Err_numba, marked _nb: plain functions
+# of the state, the time and an array of parameters, in the order given
+# by the numba_params of the matching Integrator
+#
+def daisy_derivs_nb(y, t, params):
+    """Integ53.derivs5 with params = (albedo_white, chi, S0, L,
+       albedo_black, R, albedo_ground)
+    """
+    albedo_white, chi, S0, L, albedo_black, R, albedo_ground = params
+    sigma = 5.67e-8  # Stefan Boltzman constant W/m^2/K^4
+    x = 1.0 - y[0] - y[1]
+    albedo_p = albedo_ground
+    Te_4 = S0 / 4.0 * L * (1.0 - albedo_p) / sigma
+    eta = R * L * S0 / (4.0 * sigma)
+    temp_b = (eta * (albedo_p - albedo_black) + Te_4)**0.25
+    temp_w = (eta * (albedo_p - albedo_white) + Te_4)**0.25
+    if(temp_b >= 277.5 and temp_b <= 312.5):
+        beta_b = 1.0 - 0.003265 * (295.0 - temp_b)**2.0
+    else:
+        beta_b = 0.0
+    if(temp_w >= 277.5 and temp_w <= 312.5):
+        beta_w = 1.0 - 0.003265 * (295.0 - temp_w)**2.0
+    else:
+        beta_w = 0.0
+    f = np.empty(2)
+    f[0] = y[0] * (beta_w * x - chi)
+    f[1] = y[1] * (beta_b * x - chi)
+    return f
+
+
+def lorenz_derivs_nb(coords, t, params):
+    """IntegLorenz.derivs5 with params = (sigma, beta, rho), written out
+    for numba; derivs5 itself calls numlabs.lab6.lorenz.lorenz_derivs
+    """
+    sigma, beta, rho = params
+    x, y, z = coords[0], coords[1], coords[2]
+    f = np.empty(3)
+    f[0] = sigma * (y - x)
+    f[1] = x * (rho - z) - y
+    f[2] = x * y - beta * z
+    return f
+
+
+def vanderpol_derivs_nb(y, t, params):
+    """IntegVanDerPol.derivs5 with params = (mu,)
+    """
+    mu = params[0]
+    f = np.empty(2)
+    f[0] = y[1]
+    f[1] = mu * (1.0 - y[0]**2.0) * y[1] - y[0]
+    return f
+
+
+@functools.lru_cache(maxsize=None)
+def get_timeloop(derivs):
+    """
+    return a numba compiled version of Integrator.timeloop5Err, with
+    rkckODE5 written out as loops, for the right hand side derivs(y, t,
+    params).  The compiled function is cached for each derivs.
+    """
+    if numba is None:
+        raise ImportError('get_timeloop needs numba')
+    jit = numba.jit(nopython=True, nogil=True)
+    derivs = jit(derivs)
+
+    def timeloop(yinit, tstart, tend, dt, params, adapt, a, c1, c2, b):
+        dtpassmin, dtpassmax, dtfailmin, dtfailmax = adapt[:4]
+        s, rtol, atol, maxfail = adapt[4:]
+        nvars = yinit.shape[0]
+        # output arrays that double in size when they fill up
+        size = 1024
+        timeVals = np.empty(size)
+        yvals = np.empty((size, nvars))
+        errorVals = np.empty((size, nvars))
+        derivArray = np.empty((6, nvars))
+        ytemp = np.empty(nvars)
+        oldTime = tstart
+        olddt = dt
+        yold = yinit.copy()
+        yerror = np.zeros(nvars)
+        nsteps = 0
+        goodsteps = 0
+        badsteps = 0
+        dtnew = dt
+        timeStep = tstart
+        while oldTime < tend:
+            if nsteps == size:
+                size = 2 * size
+                bigger = np.empty(size)
+                bigger[:nsteps] = timeVals
+                timeVals = bigger
+                bigger2 = np.empty((size, nvars))
+                bigger2[:nsteps] = yvals
+                yvals = bigger2
+                bigger2 = np.empty((size, nvars))
+                bigger2[:nsteps] = errorVals
+                errorVals = bigger2
+            timeVals[nsteps] = oldTime
+            yvals[nsteps] = yold
+            errorVals[nsteps] = yerror
+            nsteps += 1
+            goodStep = False
+            failSteps = 0
+            while not goodStep:
+                if failSteps > maxfail:
+                    raise Exception('failSteps > a.maxfail')
+                # rkckODE5
+                derivArray[0] = derivs(yold, oldTime, params)
+                for i in range(5):
+                    for n in range(nvars):
+                        total = 0.0
+                        for j in range(i + 1):
+                            total += b[i, j] * derivArray[j, n]
+                        ytemp[n] = yold[n] + olddt * total
+                    derivArray[i + 1] = derivs(ytemp, oldTime + a[i] * olddt,
+                                               params)
+                errtest = 0.0
+                for n in range(nvars):
+                    total = 0.0
+                    error = 0.0
+                    for j in range(6):
+                        total += c1[j] * derivArray[j, n]
+                        error += c2[j] * derivArray[j, n]
+                    ytemp[n] = yold[n] + olddt * total
+                    yerror[n] = olddt * error
+                    errtest += (yerror[n] / (atol + rtol * abs(ytemp[n])))**2.0
+                errtest = np.sqrt(errtest / nvars)
+                timeStep = oldTime + olddt
+                dtchange = s * (1.0 / errtest)**0.2
+                if errtest > 1.0:
+                    if dtchange > dtfailmax:
+                        olddt = dtfailmax * olddt
+                    elif dtchange < dtfailmin:
+                        olddt = dtfailmin * olddt
+                    else:
+                        olddt = dtchange * olddt
+                    if timeStep + olddt == timeStep:
+                        raise Exception('step smaller than machine precision')
+                    failSteps += 1
+                    timeStep = oldTime
+                else:
+                    if abs(1.0 - dtchange) > dtpassmin:
+                        if dtchange > dtpassmax:
+                            dtnew = dtpassmax * olddt
+                        else:
+                            dtnew = dtchange * olddt
+                    else:
+                        dtnew = olddt
+                    goodStep = True
+                    oldTime = timeStep
+                    yold[:] = ytemp
+                    goodsteps += 1
+                badsteps += failSteps
+            if timeStep + dtnew > tend:
+                olddt = tend - timeStep
+            elif timeStep + 2.0 * dtnew > tend:
+                olddt = (tend - timeStep) / 2.0
+            else:
+                olddt = dtnew
+        return (timeVals[:nsteps].copy(), yvals[:nsteps].copy(),
+                errorVals[:nsteps].copy(), goodsteps, badsteps)
+
+    return jit(timeloop)
+
+
 class Integ53(Integrator):
+    # compiled version of derivs5 for timeloop5Err_numba
+    numba_derivs = staticmethod(daisy_derivs_nb)
+    numba_params = ('albedo_white', 'chi', 'S0', 'L', 'albedo_black', 'R',
+                    'albedo_ground')
 
     def set_yinit(self):
         #
         # read in 'albedo_white chi S0 L albedo_black R albedo_ground'
         #
-        uservars = namedtuple('uservars', self.config['uservars'].keys())
-        self.uservars = uservars(**self.config['uservars'])
+        self.uservars = make_namedtuple('uservars', self.config['uservars'])
         #
         # read in 'whiteconc blackconc'
         #
-        initvars = namedtuple('initvars', self.config['initvars'].keys())
-        self.initvars = initvars(**self.config['initvars'])
+        self.initvars = make_namedtuple('initvars', self.config['initvars'])
         self.yinit = np.array(
             [self.initvars.whiteconc, self.initvars.blackconc])
         self.nvars = len(self.yinit)
@@ -325,8 +972,415 @@ class Integ53(Integrator):
         return f
     
     
+class IntegLorenz(Integrator):
+    """
+    the Lorenz equations from lab 6 (Integ61 in the lab 6 notebook), with
+    optional dictionaries to override the initvars, uservars and timevars
+    in the yaml file
+    """
+
+    numba_derivs = staticmethod(lorenz_derivs_nb)
+    numba_params = ('sigma', 'beta', 'rho')
+
+    def __init__(self, coeffFileName, initvars=None, uservars=None,
+                 timevars=None):
+        super().__init__(coeffFileName)
+        self.set_yinit(initvars, uservars, timevars)
+
+    def set_yinit(self, initvars=None, uservars=None, timevars=None):
+        #
+        # read in 'sigma beta rho', override if uservars not None
+        #
+        if uservars:
+            self.config['uservars'].update(uservars)
+        self.uservars = make_namedtuple('uservars', self.config['uservars'])
+        #
+        # read in 'x y z'
+        #
+        if initvars:
+            self.config['initvars'].update(initvars)
+        self.initvars = make_namedtuple('initvars', self.config['initvars'])
+        #
+        # set dt, tstart, tend if overiding base class values
+        #
+        if timevars:
+            self.config['timevars'].update(timevars)
+            self.timevars = make_namedtuple('timevars', self.config['timevars'])
+        self.yinit = np.array(
+            [self.initvars.x, self.initvars.y, self.initvars.z])
+        self.nvars = len(self.yinit)
+
+    def derivs5(self, coords, t):
+        u = self.uservars
+        return lorenz.lorenz_derivs(coords, u.sigma, u.beta, u.rho)
+
+
+class IntegVanDerPol(Integrator):
+    """
+    the Van der Pol oscillator from demonstrations/joblib_example.py,
+
+    y1' = y2
+    y2' = mu (1 - y1**2) y2 - y1
+
+    which is stiff for large mu; numeric_notebooks/lab5/vanderpol.yaml
+    sets method: rosenbrock, with mu=1000 over about two periods.  There
+    rosenbrock takes 18859 good and 692 bad steps, and rkck 1478298 good
+    and 1478285 bad steps.  (At mu=200 the gain is only about a factor of
+    4.)  Dictionaries override the yaml initvars, uservars and timevars
+    as for IntegLorenz.
+    """
+    numba_derivs = staticmethod(vanderpol_derivs_nb)
+    numba_params = ('mu',)
+
+    def __init__(self, coeffFileName, initvars=None, uservars=None,
+                 timevars=None):
+        super().__init__(coeffFileName)
+        self.set_yinit(initvars, uservars, timevars)
+
+    def set_yinit(self, initvars=None, uservars=None, timevars=None):
+        if uservars:
+            self.config['uservars'].update(uservars)
+        self.uservars = make_namedtuple('uservars', self.config['uservars'])
+        if initvars:
+            self.config['initvars'].update(initvars)
+        self.initvars = make_namedtuple('initvars', self.config['initvars'])
+        if timevars:
+            self.config['timevars'].update(timevars)
+            self.timevars = make_namedtuple('timevars', self.config['timevars'])
+        self.yinit = np.array([self.initvars.y1, self.initvars.y2], 'float')
+        self.nvars = len(self.yinit)
+
+    def derivs5(self, y, t):
+        mu = self.uservars.mu
+        f = np.empty_like(y)
+        f[0] = y[1]
+        f[1] = mu * (1.0 - y[0]**2.0) * y[1] - y[0]
+        return f
+
+    def jacobian(self, y, t):
+        mu = self.uservars.mu
+        return np.array([[0.0, 1.0],
+                         [-2.0 * mu * y[0] * y[1] - 1.0,
+                          mu * (1.0 - y[0]**2.0)]])
+
+
+class EnsembleIntegrator(Integrator):
+    """
+    Integrate many members of the same system at once.  The state is an
+    (nmembers, nvars) array, and derivs5(y, t) gets the rows of the
+    members being advanced together with their times t, shaped (n,).
+    Entries of uservars can be arrays with one value per member; before
+    derivs5 is called they are cut down to the members being advanced.
+
+    timeloop5Err keeps a separate adaptive timestep for each member and
+    stops advancing members once they reach tend, so each member takes
+    the same steps it would take on its own.
+
+    Subclasses supply set_yinit and a vectorized derivs5, as for
+    Integrator; see EnsembleInteg53 and EnsembleLorenz.
+    """
+
+    def set_ensemble(self, initnames, initvars=None, uservars=None):
+        """
+        read initvars and uservars from the yaml file, override them with
+        the initvars and uservars dictionaries, whose values can be arrays
+        with one entry per member, and set yinit to the (nmembers, nvars)
+        array of the initvars in the order given by initnames
+        """
+        if uservars:
+            self.config['uservars'].update(uservars)
+        if initvars:
+            self.config['initvars'].update(initvars)
+        user = {key: np.asarray(value, dtype=float)
+                for key, value in self.config['uservars'].items()}
+        init = {key: np.asarray(value, dtype=float)
+                for key, value in self.config['initvars'].items()}
+        nmembers = np.broadcast(*(list(user.values()) + list(init.values()) +
+                                  [np.empty(1)])).size
+        # keep per member uservars as (nmembers,) arrays, scalars as floats
+        user = {key: (np.broadcast_to(value, (nmembers,)) if value.ndim
+                      else float(value)) for key, value in user.items()}
+        self.ensemble_uservars = make_namedtuple('uservars', user)
+        self.uservars = self.ensemble_uservars
+        self.initvars = make_namedtuple('initvars', init)
+        self.yinit = np.column_stack(
+            [np.broadcast_to(init[name], (nmembers,)) for name in initnames])
+        self.nmembers, self.nvars = self.yinit.shape
+
+    def select_members(self, members):
+        """
+        set self.uservars to the values for the members in the index
+        array members
+        """
+        user = self.ensemble_uservars
+        self.uservars = user._make(
+            value[members] if np.ndim(value) else value for value in user)
+
+    def rkckODE5(self, yold, timeStep, deltaT):
+        """
+        one Cash-Karp step for every row of yold, with times and timesteps
+        that are either scalars or one per row
+        """
+        a, c1, c2, b = self.rkckConsts
+        timeStep = np.broadcast_to(timeStep, yold.shape[:1])
+        deltaT = np.broadcast_to(deltaT, yold.shape[:1])
+        dtcol = deltaT[:, np.newaxis]
+        derivArray = np.empty((6,) + yold.shape, 'float')
+        derivArray[0] = self.derivs5(yold, timeStep)
+        for i in range(5):
+            derivArray[i + 1] = self.derivs5(
+                yold + dtcol * np.tensordot(b[i, :i + 1], derivArray[:i + 1],
+                                            axes=1),
+                timeStep + a[i] * deltaT)
+        y = yold + dtcol * np.tensordot(c1, derivArray, axes=1)
+        estError = dtcol * np.tensordot(c2, derivArray, axes=1)
+        return (y, estError, timeStep + deltaT)
+
+    def timeloop5Err(self):
+        """
+        adaptive timestepping for every member, following
+        Integrator.timeloop5Err.  Each pass through the loop tries one
+        step for every member that hasn't reached tend, and members whose
+        error is too large retry with a smaller step on the next pass.
+
+        returns lists with one entry per member: the accepted times, the
+        (nsteps, nvars) values and errors
+        """
+        if self.stepper != self.rkckODE5:
+            raise ValueError('EnsembleIntegrator only supports method: rkck')
+        t = self.timevars
+        a = self.adaptvars
+        nmembers = self.nmembers
+        oldTime = np.full(nmembers, float(t.tstart))
+        olddt = np.full(nmembers, float(t.dt))
+        yold = self.yinit.astype(float)
+        yerror = np.zeros_like(yold)
+        failSteps = np.zeros(nmembers, dtype=int)
+        self.goodsteps = np.zeros(nmembers, dtype=int)
+        self.badsteps = np.zeros(nmembers, dtype=int)
+        # one row per pass through the loop, with a flag for the members
+        # that took a step
+        timeRows = OutputBuffer((nmembers,))
+        yRows = OutputBuffer(yold.shape)
+        errorRows = OutputBuffer(yold.shape)
+        takenRows = OutputBuffer((nmembers,), dtype=bool)
+        timeRows.append(oldTime)
+        yRows.append(yold)
+        errorRows.append(yerror)
+        takenRows.append(True)
+        active = np.nonzero(oldTime < t.tend)[0]
+        try:
+            while active.size > 0:
+                if np.any(failSteps[active] > a.maxfail):
+                    raise Exception('failSteps > a.maxfail')
+                self.select_members(active)
+                ynew, yerr, timeStep = self.rkckODE5(
+                    yold[active], oldTime[active], olddt[active])
+                dt = olddt[active]
+                #
+                # lab 5 section 4.2.3, one error test per member
+                #
+                errtest = np.sqrt(np.mean(
+                    (yerr / (a.atol + a.rtol * np.abs(ynew)))**2.0, axis=1))
+                with np.errstate(divide='ignore'):
+                    dtchange = a.s * (1.0 / errtest)**0.2
+                bad = errtest > 1.0
+                good = ~bad
+                #
+                # members whose estimated error is too big: reduce the
+                # timestep and retry on the next pass
+                #
+                dtfail = np.where(dtchange > a.dtfailmax, a.dtfailmax * dt,
+                                  np.where(dtchange < a.dtfailmin,
+                                           a.dtfailmin * dt, dtchange * dt))
+                if np.any(timeStep[bad] + dtfail[bad] == timeStep[bad]):
+                    raise Exception('step smaller than machine precision')
+                failSteps[active[bad]] += 1
+                self.badsteps[active[bad]] += 1
+                #
+                # members that passed: keep the step and try to enlarge the
+                # timestep, then special case the last one or two steps
+                #
+                dtnew = np.where(np.abs(1.0 - dtchange) > a.dtpassmin,
+                                 np.where(dtchange > a.dtpassmax,
+                                          a.dtpassmax * dt, dtchange * dt),
+                                 dt)
+                timeStep = timeStep[good]
+                dtnew = dtnew[good]
+                dtnew = np.where(timeStep + dtnew > t.tend, t.tend - timeStep,
+                                 np.where(timeStep + 2.0 * dtnew > t.tend,
+                                          (t.tend - timeStep) / 2.0, dtnew))
+                passed = active[good]
+                yold[passed] = ynew[good]
+                yerror[passed] = yerr[good]
+                oldTime[passed] = timeStep
+                failSteps[passed] = 0
+                self.goodsteps[passed] += 1
+                olddt[active[bad]] = dtfail[bad]
+                olddt[passed] = dtnew
+
+                taken = np.zeros(nmembers, bool)
+                taken[passed] = True
+                timeRows.append(oldTime)
+                yRows.append(yold)
+                errorRows.append(yerror)
+                takenRows.append(taken)
+                active = np.nonzero(oldTime < t.tend)[0]
+        finally:
+            self.uservars = self.ensemble_uservars
+        timeRows = timeRows.values()
+        yRows = yRows.values()
+        errorRows = errorRows.values()
+        takenRows = takenRows.values()
+        # the last value of each member is at tend, which timeloop5Err
+        # leaves out, so drop it here too
+        timeVals = []
+        yvals = []
+        errorVals = []
+        for member in range(nmembers):
+            steps = np.nonzero(takenRows[:, member])[0][:-1]
+            timeVals.append(timeRows[steps, member])
+            yvals.append(yRows[steps, member])
+            errorVals.append(errorRows[steps, member])
+        self.timevals = timeVals
+        self.yvals = yvals
+        self.errorVals = errorVals
+        return (timeVals, yvals, errorVals)
+
+
+class EnsembleInteg53(EnsembleIntegrator):
+    """
+    an ensemble of Integ53 daisyworlds; initvars (whiteconc, blackconc)
+    and uservars can be given per member, e.g.
+    EnsembleInteg53('adapt.yaml', uservars={'chi': np.linspace(0.1, 0.5, 100)})
+    """
+
+    def __init__(self, coeffFileName, initvars=None, uservars=None):
+        super().__init__(coeffFileName)
+        self.set_yinit(initvars, uservars)
+
+    def set_yinit(self, initvars=None, uservars=None):
+        self.set_ensemble(('whiteconc', 'blackconc'), initvars, uservars)
+
+    def derivs5(self, y, t):
+        """y[:, 0]=fraction white daisies
+           y[:, 1]=fraction black daisies
+           same as Integ53.derivs5, for rows of y
+        """
+        sigma = 5.67e-8  # Stefan Boltzman constant W/m^2/K^4
+        user = self.uservars
+        x = 1.0 - y[:, 0] - y[:, 1]
+        albedo_p = user.albedo_ground
+        Te_4 = user.S0 / 4.0 * user.L * (1.0 - albedo_p) / sigma
+        eta = user.R * user.L * user.S0 / (4.0 * sigma)
+        temp_b = (eta * (albedo_p - user.albedo_black) + Te_4)**0.25
+        temp_w = (eta * (albedo_p - user.albedo_white) + Te_4)**0.25
+        beta_b = np.where((temp_b >= 277.5) & (temp_b <= 312.5),
+                          1.0 - 0.003265 * (295.0 - temp_b)**2.0, 0.0)
+        beta_w = np.where((temp_w >= 277.5) & (temp_w <= 312.5),
+                          1.0 - 0.003265 * (295.0 - temp_w)**2.0, 0.0)
+        f = np.empty_like(y)
+        f[:, 0] = y[:, 0] * (beta_w * x - user.chi)
+        f[:, 1] = y[:, 1] * (beta_b * x - user.chi)
+        return f
+
+
+class EnsembleLorenz(EnsembleIntegrator):
+    """
+    an ensemble of IntegLorenz systems; initvars (x, y, z) and uservars
+    (sigma, beta, rho) can be given per member
+    """
+
+    def __init__(self, coeffFileName, initvars=None, uservars=None):
+        super().__init__(coeffFileName)
+        self.set_yinit(initvars, uservars)
+
+    def set_yinit(self, initvars=None, uservars=None):
+        self.set_ensemble(('x', 'y', 'z'), initvars, uservars)
+
+    def derivs5(self, coords, t):
+        u = self.uservars
+        return lorenz.lorenz_derivs(coords, u.sigma, u.beta, u.rho)
+
+
+def benchmark_rkck(solver, nsteps=2000):
+    """
+    time one rkckODE5 step and the timeloop5Err error norm, against the
+    original loop versions, for an initialized solver
+    returns (loop seconds/step, vectorized seconds/step)
+    """
+    y = solver.yinit
+    t = solver.timevars.tstart
+    dt = solver.timevars.dt
+    a = solver.adaptvars
+    ynew, yerror, t = solver.rkckODE5(y, t, dt)
+
+    start = time.perf_counter()
+    for step in range(nsteps):
+        ynew, yerror, newtime = solver.rkckODE5_loop(y, t, dt)
+        errtest = 0.
+        for i in range(solver.nvars):
+            errtest = errtest + \
+                (yerror[i] / (a.atol + a.rtol * np.abs(ynew[i])))**2.0
+        errtest = np.sqrt(errtest / solver.nvars)
+    loop_time = (time.perf_counter() - start) / nsteps
+
+    start = time.perf_counter()
+    for step in range(nsteps):
+        ynew, yerror, newtime = solver.rkckODE5(y, t, dt)
+        errtest = np.sqrt(np.mean(
+            (yerror / (a.atol + a.rtol * np.abs(ynew)))**2.0))
+    vector_time = (time.perf_counter() - start) / nsteps
+    return (loop_time, vector_time)
+
+
+def benchmark_stiff(coeffFileName, methods=('rosenbrock', 'rkck')):
+    """
+    integrate the Van der Pol oscillator in coeffFileName with each
+    method and print the accepted and rejected steps and the run time;
+    rkck runs through timeloop5Err_numba if numba is installed, since it
+    needs millions of steps at mu=1000
+    """
+    for method in methods:
+        solver = IntegVanDerPol(coeffFileName)
+        solver.set_method(method)
+        start = time.perf_counter()
+        if method == 'rkck' and numba is not None:
+            solver.timeloop5Err_numba()
+        else:
+            solver.timeloop5Err()
+        print('{}: {} good steps, {} bad steps, {:.3g} s'.format(
+            method, solver.goodsteps, solver.badsteps,
+            time.perf_counter() - start))
+
+
 if __name__ == "__main__":
     import matplotlib.pyplot as plt
+    import sys
+
+    if len(sys.argv) == 2 and sys.argv[1] == 'benchmark':
+        # per step cost of the daisyworld and Lorenz configurations
+        notebooks = Path(__file__).resolve().parents[2] / 'numeric_notebooks'
+        for name, solver in (
+                ('daisyworld', Integ53(notebooks / 'lab5' / 'adapt.yaml')),
+                ('lorenz', IntegLorenz(notebooks / 'lab6' / 'lorenz.yaml'))):
+            loop_time, vector_time = benchmark_rkck(solver)
+            print('{}: loop {:.3g} s/step, vectorized {:.3g} s/step'.format(
+                name, loop_time, vector_time))
+            if numba is not None:
+                # compile first, then time a whole run both ways
+                solver.timeloop5Err_numba()
+                start = time.perf_counter()
+                solver.timeloop5Err()
+                python_time = time.perf_counter() - start
+                start = time.perf_counter()
+                solver.timeloop5Err_numba()
+                numba_time = time.perf_counter() - start
+                print('{}: timeloop5Err {:.3g} s, numba {:.3g} s'.format(
+                    name, python_time, numba_time))
+        # stiff Van der Pol, mu=1000, with the implicit and explicit methods
+        benchmark_stiff(notebooks / 'lab5' / 'vanderpol.yaml')
+        sys.exit()
 
     theSolver = Integ53('init_files/conduction.yaml')
     timeVals, yVals, errorList = theSolver.timeloop5fixed()
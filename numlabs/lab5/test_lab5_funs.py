@@ -0,0 +1,51 @@
+"""
+To run:
+
+pytest numlabs/lab5/test_lab5_funs.py
+
+Checks that timeloop5Err_numba reproduces timeloop5Err for the
+daisyworld configuration in numeric_notebooks/lab5/adapt.yaml, and that
+it refuses the rosenbrock method it doesn't implement.  The tests are
+skipped if numba isn't installed.
+"""
+
+from pathlib import Path
+
+from numpy.testing import assert_allclose
+import pytest
+
+from numlabs.lab5 import lab5_funs
+
+pytest.importorskip('numba')
+
+notebooks = Path(__file__).resolve().parents[2] / 'numeric_notebooks'
+
+
+def test_numba_daisy():
+    """
+    the compiled loop takes the same steps as timeloop5Err, and the
+    times, values and errors agree to round-off
+    """
+    solver = lab5_funs.Integ53(notebooks / 'lab5' / 'adapt.yaml')
+    timeVals, yvals, errorVals = solver.timeloop5Err()
+    steps = (solver.goodsteps, solver.badsteps)
+    timeNumba, yNumba, errorNumba = solver.timeloop5Err_numba()
+    assert (solver.goodsteps, solver.badsteps) == steps
+    assert timeNumba.shape == timeVals.shape
+    assert_allclose(timeNumba, timeVals, rtol=1.e-10)
+    assert_allclose(yNumba, yvals, rtol=1.e-10, atol=1.e-12)
+    assert_allclose(errorNumba, errorVals, rtol=0, atol=1.e-14)
+
+
+def test_numba_rosenbrock():
+    """
+    a solver set to the rosenbrock method can't use the compiled loop
+    """
+    solver = lab5_funs.IntegVanDerPol(notebooks / 'lab5' / 'vanderpol.yaml')
+    with pytest.raises(ValueError):
+        solver.timeloop5Err_numba()
+
+
+if __name__ == "__main__":
+    print('testing __file__: {}'.format(__file__))
+    pytest.main([__file__, '-vv'])
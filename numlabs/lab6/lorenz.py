@@ -0,0 +1,403 @@
+#!/usr/bin/env python
+"""Integrate ensembles of Lorenz trajectories (lab 6) in one vectorized
+call, and estimate the leading Lyapunov exponent of each member.
+
+The state of an ensemble is an (N, 3) array of (x, y, z), and sigma,
+beta and rho are either scalars or arrays with one value per member, so
+the same call integrates N starting points, N parameter sets, or both.
+lorenz_derivs works on any (..., 3) array, so it is also the right hand
+side of IntegLorenz and EnsembleLorenz in numlabs.lab5.lab5_funs.
+
+EnsembleLorenz picks its own adaptive step for every member, which is
+what you want for accurate trajectories, but here every member takes the
+same fixed rk4_step: the tangent vectors in lyapunov have to be stepped
+with exactly the stages of their trajectory and renormalized at regular
+times, and LorenzAnimator needs all the members at the same time in each
+frame.
+
+Example usage from the notebook::
+
+  from numlabs.lab6 import lorenz
+  # 20 random starting points, output at 1000 times
+  x0 = -15 + 30 * np.random.random((20, 3))
+  t = np.linspace(0, 4, 1000)
+  x_t = lorenz.lorenz_ensemble(x0, t)     # shape (20, 1000, 3)
+
+  # leading Lyapunov exponent for the classic parameters, about 0.9
+  lorenz.lyapunov(x0)
+
+  # predictability across parameter space, on all cores
+  params, lyap = lorenz.lyapunov_map(rho=np.linspace(10, 200, 96))
+
+  # animate the ensemble without integrating it all first, keeping
+  # the last 200 points of each trajectory
+  fig = plt.figure()
+  ax = fig.add_axes([0, 0, 1, 1], projection='3d')
+  animator = lorenz.LorenzAnimator(ax, x0, dt=0.004, window=200)
+  anim = animator.animate(fig, frames=500)
+
+Example usage from the shell::
+
+  # time the ensemble against one odeint call per trajectory
+  $ python lorenz.py benchmark
+"""
+from concurrent.futures import ProcessPoolExecutor
+import os
+import queue
+import sys
+import threading
+import time
+import numpy as np
+
+
+def lorenz_derivs(coords, sigma=10., beta=8./3, rho=28.):
+    """
+    dx/dt, dy/dt, dz/dt for coords with shape (..., 3)
+    """
+    x, y, z = coords[..., 0], coords[..., 1], coords[..., 2]
+    f = np.empty_like(coords)
+    f[..., 0] = sigma * (y - x)
+    f[..., 1] = x * (rho - z) - y
+    f[..., 2] = x * y - beta * z
+    return f
+
+
+def tangent_derivs(coords, vectors, sigma=10., beta=8./3, rho=28.):
+    """
+    the tangent linear model: the Jacobian of lorenz_derivs at coords
+    times the perturbation vectors, both with shape (..., 3)
+    """
+    x, y, z = coords[..., 0], coords[..., 1], coords[..., 2]
+    dx, dy, dz = vectors[..., 0], vectors[..., 1], vectors[..., 2]
+    f = np.empty_like(vectors)
+    f[..., 0] = sigma * (dy - dx)
+    f[..., 1] = (rho - z) * dx - dy - x * dz
+    f[..., 2] = y * dx + x * dy - beta * dz
+    return f
+
+
+def rk4_step(coords, dt, params, vectors=None):
+    """
+    one fourth order Runge-Kutta step (lab 4) for every member, and for
+    the tangent vectors along the trajectories if they are given.
+    params is the dictionary of sigma, beta and rho;
+    returns (coords, vectors)
+    """
+    k1 = lorenz_derivs(coords, **params)
+    k2 = lorenz_derivs(coords + 0.5 * dt * k1, **params)
+    k3 = lorenz_derivs(coords + 0.5 * dt * k2, **params)
+    k4 = lorenz_derivs(coords + dt * k3, **params)
+    if vectors is not None:
+        # the tangent equations are linear in the vectors, but the
+        # Jacobian changes along each stage of the trajectory step
+        l1 = tangent_derivs(coords, vectors, **params)
+        l2 = tangent_derivs(coords + 0.5 * dt * k1,
+                            vectors + 0.5 * dt * l1, **params)
+        l3 = tangent_derivs(coords + 0.5 * dt * k2,
+                            vectors + 0.5 * dt * l2, **params)
+        l4 = tangent_derivs(coords + dt * k3, vectors + dt * l3, **params)
+        vectors = vectors + dt / 6. * (l1 + 2. * l2 + 2. * l3 + l4)
+    coords = coords + dt / 6. * (k1 + 2. * k2 + 2. * k3 + k4)
+    return (coords, vectors)
+
+
+def member_params(sigma, beta, rho):
+    """
+    sigma, beta and rho as a dictionary of arrays that broadcast against
+    an (N, ) ensemble, so they work with the [..., i] indexing of
+    lorenz_derivs
+    """
+    return {'sigma': np.asarray(sigma, dtype=float),
+            'beta': np.asarray(beta, dtype=float),
+            'rho': np.asarray(rho, dtype=float)}
+
+
+def lorenz_ensemble(x0, t, sigma=10., beta=8./3, rho=28., max_dt=0.005):
+    """
+    integrate every starting point in x0, shape (N, 3), with rk4_step,
+    taking as many substeps of at most max_dt as needed between the
+    output times t.  sigma, beta and rho are scalars or (N,) arrays.
+
+    returns x_t with shape (N, len(t), 3), the same layout as the list
+    of odeint solutions in numeric_notebooks/lab6/lorenz_ode.py
+    """
+    coords = np.array(x0, dtype=float)
+    params = member_params(sigma, beta, rho)
+    x_t = np.empty((coords.shape[0], len(t), 3))
+    x_t[:, 0] = coords
+    for i in range(1, len(t)):
+        nsub = int(np.ceil((t[i] - t[i - 1]) / max_dt))
+        dt = (t[i] - t[i - 1]) / nsub
+        for sub in range(nsub):
+            coords = rk4_step(coords, dt, params)[0]
+        x_t[:, i] = coords
+    return x_t
+
+
+def lyapunov(x0, sigma=10., beta=8./3, rho=28., dt=0.01, nsteps=20000,
+             renorm_every=10, spinup=1000, seed=None):
+    """
+    estimate the leading Lyapunov exponent of every member online: a
+    tangent vector is integrated along with each trajectory, and every
+    renorm_every steps its growth is added to a running sum of logs and
+    it is scaled back to unit length, so it never overflows and turns
+    towards the most unstable direction.  The first spinup steps put the
+    trajectories on the attractor and are not counted.
+
+    x0 is (N, 3); sigma, beta and rho are scalars or (N,) arrays
+    returns the (N,) exponents, in units of 1/time
+    """
+    coords = np.array(x0, dtype=float)
+    params = member_params(sigma, beta, rho)
+    for step in range(spinup):
+        coords = rk4_step(coords, dt, params)[0]
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal(coords.shape)
+    vectors /= np.linalg.norm(vectors, axis=-1, keepdims=True)
+    logsum = np.zeros(coords.shape[0])
+    nrenorm = nsteps // renorm_every
+    for renorm in range(nrenorm):
+        for step in range(renorm_every):
+            coords, vectors = rk4_step(coords, dt, params, vectors)
+        growth = np.linalg.norm(vectors, axis=-1)
+        logsum += np.log(growth)
+        vectors /= growth[:, np.newaxis]
+    return logsum / (nrenorm * renorm_every * dt)
+
+
+def lyapunov_chunk(args):
+    """
+    run lyapunov for one chunk of a lyapunov_map, in a worker process
+    """
+    x0, params, kwargs = args
+    return lyapunov(x0, **params, **kwargs)
+
+
+def lyapunov_map(sigma=10., beta=8./3, rho=28., n_jobs=None, x0=(1., 1., 20.),
+                 **kwargs):
+    """
+    the leading Lyapunov exponent for every combination of the sigma,
+    beta and rho values (each a scalar or a sequence), from the same
+    starting point x0.  The members are split into n_jobs chunks (default
+    os.cpu_count()) and each chunk is integrated as one ensemble in its
+    own process.  kwargs are passed to lyapunov.
+
+    returns (params, lyap): a dictionary of the sigma, beta and rho
+    arrays, shaped (len(sigma), len(beta), len(rho)), and the exponents
+    with the same shape
+    """
+    grids = np.meshgrid(np.atleast_1d(sigma), np.atleast_1d(beta),
+                        np.atleast_1d(rho), indexing='ij')
+    params = dict(zip(('sigma', 'beta', 'rho'), grids))
+    nmembers = grids[0].size
+    x0 = np.broadcast_to(np.asarray(x0, dtype=float), (nmembers, 3))
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = max(1, min(n_jobs, nmembers))
+    chunks = np.array_split(np.arange(nmembers), n_jobs)
+    args = [(x0[chunk],
+             {key: value.ravel()[chunk] for key, value in params.items()},
+             kwargs) for chunk in chunks]
+    if n_jobs == 1:
+        results = [lyapunov_chunk(arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            results = list(pool.map(lyapunov_chunk, args))
+    lyap = np.concatenate(results).reshape(grids[0].shape)
+    return (params, lyap)
+
+
+class LorenzAnimator(object):
+    """Animate an ensemble of Lorenz trajectories while integrating it.
+
+    Each frame integrates steps_per_frame more rk4_steps and copies only
+    that new segment into preallocated line buffers, so the work per
+    frame doesn't grow with the length of the trails.  With
+    pipeline=True the integration runs up to prefetch frames ahead in a
+    background thread while matplotlib draws.
+
+    window=None keeps the whole history, in buffers sized for nframes
+    frames.  window=n keeps only the last n points of each trajectory:
+    every point is written twice into a buffer of 2*n points, at i and
+    i+n, so the last n points are always the contiguous slice
+    buffer[start:start + n] and memory doesn't grow with the history.
+    """
+    def __init__(self, ax, x0, dt=0.004, steps_per_frame=2, window=None,
+                 nframes=500, sigma=10., beta=8./3, rho=28., colors=None,
+                 pipeline=True, prefetch=8):
+        import matplotlib.pyplot as plt
+
+        self.ax = ax
+        self.coords = np.array(x0, dtype=float)
+        self.dt = dt
+        self.steps_per_frame = steps_per_frame
+        self.params = member_params(sigma, beta, rho)
+        self.window = window
+        self.pipeline = pipeline
+        self.prefetch = prefetch
+        ntraj = self.coords.shape[0]
+        if window is None:
+            size = nframes * steps_per_frame + 1
+        else:
+            size = 2 * window
+        # (ntraj, npoints, 3) trail buffers, filled in as the frames come
+        self.buffer = np.empty((ntraj, size, 3))
+        self.npoints = 0
+        self.write(self.coords[:, np.newaxis])
+        if colors is None:
+            colors = plt.cm.jet(np.linspace(0, 1, ntraj))
+        self.lines = sum([ax.plot([], [], [], '-', c=c) for c in colors], [])
+        self.pts = sum([ax.plot([], [], [], 'o', c=c) for c in colors], [])
+
+    def write(self, segment):
+        """
+        append segment, shape (ntraj, nnew, 3), to the trail buffers
+        """
+        nnew = segment.shape[1]
+        if self.window is None:
+            self.buffer[:, self.npoints:self.npoints + nnew] = segment
+        else:
+            index = (self.npoints + np.arange(nnew)) % self.window
+            self.buffer[:, index] = segment
+            self.buffer[:, index + self.window] = segment
+        self.npoints += nnew
+
+    def trails(self):
+        """
+        a view of the points to draw, shape (ntraj, npoints, 3)
+        """
+        if self.window is None:
+            return self.buffer[:, :self.npoints]
+        if self.npoints <= self.window:
+            return self.buffer[:, :self.npoints]
+        start = self.npoints % self.window
+        return self.buffer[:, start:start + self.window]
+
+    def integrate(self):
+        """
+        integrate the next frame, returns the (ntraj, steps_per_frame, 3)
+        segment
+        """
+        segment = np.empty((self.coords.shape[0], self.steps_per_frame, 3))
+        coords = self.coords
+        for step in range(self.steps_per_frame):
+            coords = rk4_step(coords, self.dt, self.params)[0]
+            segment[:, step] = coords
+        self.coords = coords
+        return segment
+
+    def segments(self, frames):
+        """
+        generate the segments for frames frames, integrated in a
+        background thread if pipeline is True
+        """
+        if not self.pipeline:
+            for frame in range(frames):
+                yield self.integrate()
+            return
+        segments = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+
+        def producer():
+            for frame in range(frames):
+                if stop.is_set():
+                    break
+                segments.put(self.integrate())
+            segments.put(None)
+
+        worker = threading.Thread(target=producer, daemon=True)
+        worker.start()
+        try:
+            while True:
+                segment = segments.get()
+                if segment is None:
+                    break
+                yield segment
+        finally:
+            stop.set()
+            # let a blocked producer finish
+            while worker.is_alive():
+                try:
+                    segments.get_nowait()
+                except queue.Empty:
+                    worker.join(0.01)
+
+    def init(self):
+        for line, pt in zip(self.lines, self.pts):
+            line.set_data([], [])
+            line.set_3d_properties([])
+            pt.set_data([], [])
+            pt.set_3d_properties([])
+        return self.lines + self.pts
+
+    def update(self, segment):
+        """
+        add a segment and update the lines and points, returns the artists
+        """
+        if self.window is None and \
+                self.npoints + segment.shape[1] > self.buffer.shape[1]:
+            raise ValueError('more frames than the nframes the buffers '
+                             'were sized for')
+        self.write(segment)
+        for line, pt, trail in zip(self.lines, self.pts, self.trails()):
+            line.set_data(trail[:, 0], trail[:, 1])
+            line.set_3d_properties(trail[:, 2])
+            pt.set_data(trail[-1:, 0], trail[-1:, 1])
+            pt.set_3d_properties(trail[-1:, 2])
+        return self.lines + self.pts
+
+    def animate(self, fig, frames=500, interval=30, rotate=0.3):
+        """
+        a matplotlib FuncAnimation of frames frames, turning the view
+        by rotate degrees for every point added, as in lorenz_ode.py
+        """
+        from matplotlib import animation
+
+        def draw(segment):
+            artists = self.update(segment)
+            self.ax.view_init(30, rotate * self.npoints)
+            return artists
+
+        return animation.FuncAnimation(
+            fig, draw, frames=self.segments(frames), init_func=self.init,
+            interval=interval, blit=True, save_count=frames,
+            cache_frame_data=False)
+
+
+def benchmark(n_trajectories=(20, 200, 2000)):
+    """
+    time lorenz_ensemble against one scipy odeint call per trajectory,
+    as in numeric_notebooks/lab6/lorenz_ode.py, on t = linspace(0, 4, 1000)
+    """
+    from scipy import integrate
+
+    def lorentz_deriv(coords, t0, sigma=10., beta=8./3, rho=28.0):
+        x, y, z = coords
+        return [sigma * (y - x), x * (rho - z) - y, x * y - beta * z]
+
+    t = np.linspace(0, 4, 1000)
+    rng = np.random.default_rng(1)
+    for n in n_trajectories:
+        x0 = -15 + 30 * rng.random((n, 3))
+        start = time.perf_counter()
+        x_t = np.asarray([integrate.odeint(lorentz_deriv, x0i, t)
+                          for x0i in x0])
+        odeint_time = time.perf_counter() - start
+        start = time.perf_counter()
+        ensemble = lorenz_ensemble(x0, t)
+        ensemble_time = time.perf_counter() - start
+        # trajectories separate exponentially, so compare the first second
+        early = t <= 1.
+        print('{:5d} trajectories: odeint {:.3g} s, ensemble {:.3g} s, '
+              'max difference to t=1 {:.2g}'.format(
+                  n, odeint_time, ensemble_time,
+                  np.abs(x_t[:, early] - ensemble[:, early]).max()))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'benchmark':
+        benchmark()
+    else:
+        x0 = -15 + 30 * np.random.default_rng(1).random((20, 3))
+        print('leading Lyapunov exponents, sigma=10, beta=8/3, rho=28:')
+        print(lyapunov(x0))
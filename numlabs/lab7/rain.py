@@ -16,6 +16,11 @@ Example usage from the shell::
   # Run 5 time steps on a 9 point grid
   $ rain.py 5 9
 
+To compare the speed of the loop and vectorized leap-frog steps for
+grids of 9 to 10**6 points::
+
+  $ rain.py benchmark
+
 The graph window will close as soon as the animation finishes.  And
 the default run for 5 time steps doesn't produce much of interest; try
 at least 100 steps.
@@ -31,6 +36,7 @@ Example usage from the Python interpreter::
 from __future__ import division
 import copy
 import sys
+import time
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.colors as colors
@@ -44,20 +50,56 @@ class Quantity(object):
 
     u and h objects will be instances of this class.
     """
-    def __init__(self, n_grid, n_time):
+    def __init__(self, n_grid, n_time, store_every=1, store_file=None):
         """Initialize an object with prev, now, and next arrays of
-        n_grid points, and a store array of n_time time steps.
+        n_grid points, and a store array for the results of n_time
+        time steps.
+
+        store_every=k keeps only every k-th time step in the store
+        array, and store_every='plot' keeps only the steps that
+        make_graph plots.  If store_file is given, the store array is a
+        memory-mapped .npy file on disk instead of an array in memory.
         """
         self.n_grid = n_grid
-        # Storage for values at previous, current, and next time step
-        self.prev = np.empty(n_grid)
-        self.now = np.empty(n_grid)
-        self.next = np.empty(n_grid)
+        # Storage for values at previous, current, and next time step.
+        # The three arrays live in a ring buffer: prev, now and next are
+        # slots (self.oldest + 0, 1, 2) % 3 of self.levels, so shift()
+        # only has to advance self.oldest.
+        self.levels = [np.empty(n_grid), np.empty(n_grid), np.empty(n_grid)]
+        self.oldest = 0
         # Storage for results at each time step.  In a bigger model
         # the time step results would be written to disk and read back
-        # later for post-processing (such as plotting).
-        self.store = np.empty((n_grid, n_time))
-
+        # later for post-processing (such as plotting), which is what
+        # the store_file option does.
+        if store_every == 'plot':
+            store_every = plot_interval(n_time)
+        self.store_every = store_every
+        # The time steps that are kept; column i of store is time step
+        # stored_steps[i]
+        self.stored_steps = np.arange(0, n_time, store_every)
+        shape = (len(self.stored_steps), n_grid)
+        if store_file is None:
+            store = np.empty(shape)
+        else:
+            store = np.lib.format.open_memmap(store_file, mode='w+',
+                                              dtype=np.float64, shape=shape)
+        # Each stored time step is a contiguous row of the array, so it
+        # can be written to disk in one piece; the transpose keeps the
+        # store[:, column] indexing of the original (n_grid, n_time)
+        # array.
+        self.store = store.T
+
+    @property
+    def prev(self):
+        return self.levels[self.oldest]
+
+    @property
+    def now(self):
+        return self.levels[(self.oldest + 1) % 3]
+
+    @property
+    def next(self):
+        return self.levels[(self.oldest + 2) % 3]
 
     def store_timestep(self, time_step, attr='next'):
         """Copy the values for the specified time step to the storage
@@ -69,28 +111,50 @@ class Quantity(object):
         default, chosen because that is the most common use (in the
         time step loop).
         """
+        # Time steps that aren't kept are skipped
+        if time_step % self.store_every:
+            return
         # The __getattribute__ method let us access the attribute
         # using its name in string form;
         # i.e. x.__getattribute__('foo') is the same as x.foo, but the
         # former lets us change the name of the attribute to operate
         # on at runtime.
-        self.store[:, time_step] = self.__getattribute__(attr)
+        self.store[:, time_step // self.store_every] = self.__getattribute__(attr)
 
 
-    def shift(self):
-        """Copy the .now values to .prev, and the .next values to .new.
+    def shift(self, rotate=True):
+        """Make the .now values the .prev values, and the .next values
+        the .now values.
 
         This reduces the storage requirements of the model to 3 n_grid
         long arrays for each quantity, which becomes important as the
         domain size and model complexity increase.  It is possible to
         reduce the storage required to 2 arrays per quantity.
+
+        By default nothing is copied: the ring buffer is rotated so the
+        old .now array becomes .prev, the old .next array becomes .now,
+        and the old .prev array is reused for .next (leap_frog and
+        boundary_conditions overwrite all of it).  rotate=False copies
+        the arrays instead, as the original version of this method did.
         """
-        # Note the use of the copy() method from the copy module in
-        # the standard library here to get a copy of the array, not a
-        # copy of the reference to it.  This is an important and
-        # subtle aspect of the Python data model.
-        self.prev = copy.copy(self.now)
-        self.now = copy.copy(self.next)
+        if rotate:
+            self.oldest = (self.oldest + 1) % 3
+        else:
+            # Note the use of the copy() method from the copy module in
+            # the standard library here to get a copy of the array, not a
+            # copy of the reference to it.  This is an important and
+            # subtle aspect of the Python data model.
+            now = copy.copy(self.now)
+            next = copy.copy(self.next)
+            self.levels = [now, next, self.next]
+            self.oldest = 0
+
+
+def plot_interval(n_time):
+    """Only try to plot 20 lines, so choose an interval if there are
+    more time steps than that (i.e. plot every interval lines).
+    """
+    return int(np.ceil(n_time / 20))
 
 
 def initial_conditions(u, h, ho):
@@ -123,18 +187,22 @@ def first_time_step(u, h, g, H, dt, dx, ho, gu, gh, n_grid):
     h.now[midpoint] = ho - g * H * ho * dt ** 2 / (4 * dx ** 2)
 
 
-def leap_frog(u, h, gu, gh, n_grid):
+def leap_frog(u, h, gu, gh, n_grid, loop=False):
     """Calculate the next time step values using the leap-frog scheme
     derived from equations 4.16 and 4.17.
+
+    The vectorized version is the default; loop=True runs the original
+    loop over the grid points, which gives identical results.
     """
-    for pt in np.arange(1, n_grid - 1):
-        u.next[pt] = u.prev[pt] - gu * (h.now[pt + 1] - h.now[pt - 1])
-        h.next[pt] = h.prev[pt] - gh * (u.now[pt + 1] - u.now[pt - 1])
-#     Alternate vectorized implementation:
-#     u.next[1:n_grid - 1] = (u.prev[1:n_grid - 1]
-#                             - gu * (h.now[2:n_grid] - h.now[:n_grid - 2]))
-#     h.next[1:n_grid - 1] = (h.prev[1:n_grid - 1]
-#                             - gh * (u.now[2:n_grid] - u.now[:n_grid - 2]))
+    if loop:
+        for pt in np.arange(1, n_grid - 1):
+            u.next[pt] = u.prev[pt] - gu * (h.now[pt + 1] - h.now[pt - 1])
+            h.next[pt] = h.prev[pt] - gh * (u.now[pt + 1] - u.now[pt - 1])
+    else:
+        u.next[1:n_grid - 1] = (u.prev[1:n_grid - 1]
+                                - gu * (h.now[2:n_grid] - h.now[:n_grid - 2]))
+        h.next[1:n_grid - 1] = (h.prev[1:n_grid - 1]
+                                - gh * (u.now[2:n_grid] - u.now[:n_grid - 2]))
 
 
 def make_graph(u, h, dt, n_time):
@@ -162,14 +230,15 @@ def make_graph(u, h, dt, n_time):
     scalarMap = cmx.ScalarMappable(norm=cNorm, cmap=cmap)
 
     # Only try to plot 20 lines, so choose an interval if more than that (i.e. plot
-    # every interval lines
-    interval = np.int(np.ceil(n_time/20))
+    # every interval lines).  Only the time steps in u.stored_steps
+    # were kept, so the interval is in stored columns.
+    interval = plot_interval(len(u.stored_steps))
 
     # Do the main plot
-    for time in range(0, n_time, interval):
-        colorVal = scalarMap.to_rgba(time)
-        ax_u.plot(u.store[:, time], color=colorVal)
-        ax_h.plot(h.store[:, time], color=colorVal)
+    for column in range(0, len(u.stored_steps), interval):
+        colorVal = scalarMap.to_rgba(u.stored_steps[column])
+        ax_u.plot(u.store[:, column], color=colorVal)
+        ax_h.plot(h.store[:, column], color=colorVal)
 
     # Add the custom colorbar
     ax2 = fig.add_axes([0.95, 0.05, 0.05, 0.9])
@@ -177,10 +246,16 @@ def make_graph(u, h, dt, n_time):
     cb1.set_label('Time (s)')
     return
 
-def rain(args):
+def rain(args, store_every=1, store_prefix=None):
     """Run the model.
 
     args is a 2-tuple; (number-of-time-steps, number-of-grid-points)
+
+    store_every=k keeps every k-th time step for plotting, and
+    store_every='plot' keeps only the ones make_graph draws (about 20),
+    so long runs don't need n_grid * n_time storage.  If store_prefix
+    is given the stored steps are written to memory-mapped files
+    store_prefix + '_u.npy' and store_prefix + '_h.npy'.
     """
     n_time = int(args[0])
     n_grid = int(args[1])
@@ -196,8 +271,13 @@ def rain(args):
     gu = g * dt / dx            # first handy constant
     gh = H * dt / dx            # second handy constant
     # Create velocity and surface height objects
-    u = Quantity(n_grid, n_time)
-    h = Quantity(n_grid, n_time)
+    if store_prefix is None:
+        u_file = h_file = None
+    else:
+        u_file = store_prefix + '_u.npy'
+        h_file = store_prefix + '_h.npy'
+    u = Quantity(n_grid, n_time, store_every, u_file)
+    h = Quantity(n_grid, n_time, store_every, h_file)
     # Set up initial conditions and store them in the time step
     # results arrays
     initial_conditions(u, h, ho)
@@ -228,6 +308,45 @@ def rain(args):
     return
 
 
+def benchmark(n_grids=(9, 100, 1000, 10000, 100000, 1000000),
+              points=2000000):
+    """Time the leap-frog loop for a range of grid sizes, comparing the
+    original version (loop over grid points, copy in shift) with the
+    default one (vectorized leap_frog, ring buffer shift).
+
+    Each run takes about `points` grid point updates (at least 3 time
+    steps), and throughput is reported in grid point updates per
+    second.  Returns a list of (n_grid, n_time, loop rate, vector rate).
+    """
+    g, H, dt, dx, ho = 980, 1, 0.001, 1, 0.01
+    gu = g * dt / dx
+    gh = H * dt / dx
+    results = []
+    print('{:>8} {:>8} {:>14} {:>14} {:>8}'.format(
+        'n_grid', 'n_time', 'loop pts/s', 'vector pts/s', 'speedup'))
+    for n_grid in n_grids:
+        n_time = max(3, points // n_grid)
+        rates = []
+        for loop in (True, False):
+            u = Quantity(n_grid, 1)
+            h = Quantity(n_grid, 1)
+            initial_conditions(u, h, ho)
+            first_time_step(u, h, g, H, dt, dx, ho, gu, gh, n_grid)
+            boundary_conditions(u.now, h.now, n_grid)
+            start = time.perf_counter()
+            for t in range(2, n_time):
+                leap_frog(u, h, gu, gh, n_grid, loop)
+                boundary_conditions(u.next, h.next, n_grid)
+                u.shift(rotate=not loop)
+                h.shift(rotate=not loop)
+            elapsed = time.perf_counter() - start
+            rates.append(n_grid * (n_time - 2) / elapsed)
+        print('{:8d} {:8d} {:14.4g} {:14.4g} {:8.1f}'.format(
+            n_grid, n_time, rates[0], rates[1], rates[1] / rates[0]))
+        results.append((n_grid, n_time, rates[0], rates[1]))
+    return results
+
+
 if __name__ == '__main__':
     # sys.argv is the command-line arguments as a list. It includes
     # the script name as its 0th element. Check for the degenerate
@@ -243,7 +362,10 @@ if __name__ == '__main__':
     #
     #  mencoder mf://*.png -mf type=png:w=800:h=600:fps=25 -ovc lavc -lavcopts vcodec=mpeg4 -oac copy -o outputmplt.avi
     #
-    if len(sys.argv) == 1 or 'sphinx-build' in sys.argv[0]:
+    if len(sys.argv) == 2 and sys.argv[1] == 'benchmark':
+        # Compare the loop and vectorized leap-frog steps
+        benchmark()
+    elif len(sys.argv) == 1 or 'sphinx-build' in sys.argv[0]:
         # Default to 50 time steps, and 9 grid points
         rain((50, 9))
         plt.show()
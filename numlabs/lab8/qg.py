@@ -8,21 +8,82 @@
     psi = qg(time, loop=False)
     2) from the command line, returns a plot for you
     python qg.py time False
-    
+    python qg.py time False multigrid
+
+    The chi equation can be solved with the original Jacobi relaxation
+    (solver='jacobi', the default) or with a geometric multigrid cycle
+    (solver='multigrid'), whose iteration count does not grow with nx:
+    psi = qg(time, nx=129, solver='multigrid')
+    Multigrid coarsens while nx-1 is even, so nx = 2**k + 1 works best.
+    solver='fast_poisson' solves it exactly with a 2-D discrete sine
+    transform; check_fast_poisson compares it with the Jacobi answer.
+
+    QGModel does the same integration as qg() with its work arrays
+    allocated once and every stencil written in place:
+    model = QGModel(nx=129)
+    psi = model.run(time)
+    python qg.py benchmark
+    compares the two on 30x30, 129x129 and 513x513 grids.
+    If numba is installed, QGModel(use_numba=True) evaluates vis, mybeta and
+    jac with compiled loops that visit each point once, and parallel=True
+    splits the rows across cores.  test_qg.py checks that they give
+    bitwise the same answers as the NumPy versions:
+    pytest numlabs/lab8/test_qg.py
+
+    vis, mybeta, jac, chi and the solvers also accept an ensemble of fields
+    shaped (nens, nx, ny), so qg(time, psi_init=psi0) with psi0 shaped that
+    way steps every member at once.
+
+    Long runs can save psi_1 and chi every few steps and checkpoint the
+    model state so a run that stops can be picked up again:
+    model = QGModel(nx=129)
+    model.run(time, outdir='spinup', snapshot_every=10, checkpoint_every=100)
+    model = QGModel(nx=129)
+    model.run(time, outdir='spinup', snapshot_every=10, checkpoint_every=100,
+              resume=True)
+    snap_time, psi, chi = load_snapshots('spinup')
+
+    qg_sweep runs a set of models in parallel processes, for example
+    members, psi, seconds = qg_sweep({'epsilon': [1e-5, 1e-4],
+                                      'vis': [1e-3, 1e-2]}, n_jobs=4)
+
 """
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import itertools
 import matplotlib.pyplot as plt
+import os
+import queue
+import threading
+import time
+import tracemalloc
+import warnings
 import numpy as np
+import scipy.fft as sfft
+import scipy.sparse as sparse
+import scipy.sparse.linalg as sparse_linalg
 import sys
+from pathlib import Path
+
+try:
+    import numba
+    from numba import prange
+except ImportError:
+    numba = None
+    prange = range
 
-def param():
+def param(Av=5.e-2, H=500., rho=1.0e3, latitude=45., tau_max=0.2, b=2.0e6,
+          a=2.0e6, epsilon=None, wind=-1., vis=None, verbose=True):
     # set the physical parameters of the system
-    Av = 5.e-2           # vertical eddy viscosity (m^2/s)
-    H = 500.               # depth (m)
-    rho = 1.0e3            # density of water (kg/m^3)
-    latitude = 45.         # for calculating parameters of the beta-plane (deg)
-    tau_max = 0.2          # wind stress maximum (kg m/s^2)
-    b = 2.0e6              # width of the ocean (m)
-    a = 2.0e6              # N-S extent of the ocean (m)
+    # Av = vertical eddy viscosity (m^2/s)
+    # H = depth (m)
+    # rho = density of water (kg/m^3)
+    # latitude = for calculating parameters of the beta-plane (deg)
+    # tau_max = wind stress maximum (kg m/s^2)
+    # b = width of the ocean (m)
+    # a = N-S extent of the ocean (m)
+    # epsilon, wind and vis are the nondimensional coefficients; epsilon
+    # and vis are calculated from the physical parameters unless given
 
     # necessary constants
     omega =  7.272205e-05  # rotation rate of the Earth (/s)
@@ -37,46 +98,49 @@ def param():
 
     # calculation the three nondimensional coefficients
     U0 = tau_max/(b*beta*rho*H)
-    epsilon = U0/(b*b*beta)
-    wind = -1.
-    vis = kappa/(beta*b)
+    if epsilon is None:
+        epsilon = U0/(b*b*beta)
+    if vis is None:
+        vis = kappa/(beta*b)
     time = 1./(beta*b)
 
     # display physical parameters
-    print ("Physical Parameters:")
-    print ("a = ", a)
-    print ("b = ", b)
-    print ("epsilon = ", epsilon)
-    print ("wind = ", wind)
-    print ("vis = ", vis)
-    print ("time = ", time)
-    print ("boundary_layer_width_approx = ", boundary_layer_width_approx)
+    if verbose:
+        print ("Physical Parameters:")
+        print ("a = ", a)
+        print ("b = ", b)
+        print ("epsilon = ", epsilon)
+        print ("wind = ", wind)
+        print ("vis = ", vis)
+        print ("time = ", time)
+        print ("boundary_layer_width_approx = ", boundary_layer_width_approx)
 
     return (b, a, epsilon, wind, vis, time)
 
-def numer_init():
+def numer_init(nx=30, dt=43.2e3, tol=0.5e-2, maxiter=50, coeff=1.,
+               verbose=True):
     # set up domain
-    nx = 30            # number of points in x-direction
+    # nx = number of points in x-direction (default 30)
     dx = 1./(nx-1)     # size of non-dimensional grid points
-    ny = int(1./dx+1)  # number of points in y-direction
+    ny = nx            # square basin, so as many points in y as in x
 
-    # set time step
-    dt = 43.2e3  # time step  
+    # dt = time step (s)
 
     # set up the parameters for the relaxation scheme
-    tol = 0.5e-2   # error tolerance
-    maxiter = 50     # maximum number of interation
-    coeff = 1.  # relaxation coefficient
+    # tol = error tolerance
+    # maxiter = maximum number of interation
+    # coeff = relaxation coefficient
 
     # display simulation parameters
-    print ("\nSimulation Parameters:")
-    print ("nx = ", nx)
-    print ("dx = ", dx)
-    print ("ny = ", ny)
-    print ("dt = ", dt)
-    print ("maximum iterations = ", maxiter)
-    print ("tolerance =", tol )
-    print ("coeff = ", coeff)
+    if verbose:
+        print ("\nSimulation Parameters:")
+        print ("nx = ", nx)
+        print ("dx = ", dx)
+        print ("ny = ", ny)
+        print ("dt = ", dt)
+        print ("maximum iterations = ", maxiter)
+        print ("tolerance =", tol )
+        print ("coeff = ", coeff)
 
     return (nx, dx, ny, dt, tol, maxiter, coeff)
 
@@ -91,10 +155,10 @@ def vis(psi, nx, ny):
     # indexing version
     si = 1; ei = nx-1 # start and end i indices
     sj = 1; ej = ny-1 # start and end j indices
-    visc[si:ei, sj:ej] = (
-        psi[si+1:ei+1, sj:ej] + psi[si-1:ei-1, sj:ej] +
-        psi[si:ei, sj+1:ej+1] + psi[si:ei, sj-1:ej-1]
-        - 4 * psi[si:ei, sj:ej])
+    visc[..., si:ei, sj:ej] = (
+        psi[..., si+1:ei+1, sj:ej] + psi[..., si-1:ei-1, sj:ej] +
+        psi[..., si:ei, sj+1:ej+1] + psi[..., si:ei, sj-1:ej-1]
+        - 4 * psi[..., si:ei, sj:ej])
 
     return visc
 
@@ -109,7 +173,7 @@ def mybeta(psi,nx,ny):
     # indexing version
     si = 1; ei = nx-1 # start and end i indices
     sj = 1; ej = ny-1 # start and end j indices
-    beta[si:ei, sj:ej] = psi[si+1:ei+1, sj:ej] - psi[si-1:ei-1, sj:ej]
+    beta[..., si:ei, sj:ej] = psi[..., si+1:ei+1, sj:ej] - psi[..., si-1:ei-1, sj:ej]
 
     return beta
 
@@ -158,29 +222,29 @@ def jac(psi, vis, nx, ny):
     # indexing version
     si = 1; ei = nx-1 # start and end i indices
     sj = 1; ej = ny-1 # start and end j indices
-    jaco[si:ei, sj:ej] = (
-        (psi[si+1:ei+1, sj:ej] - psi[si-1:ei-1, sj:ej]) *
-        (vis[si:ei, sj+1:ej+1] - vis[si:ei, sj-1:ej-1]) -
-        (psi[si:ei, sj+1:ej+1] - psi[si:ei, sj-1:ej-1]) *
-        (vis[si+1:ei+1, sj:ej] - vis[si-1:ei-1, sj:ej]) +
+    jaco[..., si:ei, sj:ej] = (
+        (psi[..., si+1:ei+1, sj:ej] - psi[..., si-1:ei-1, sj:ej]) *
+        (vis[..., si:ei, sj+1:ej+1] - vis[..., si:ei, sj-1:ej-1]) -
+        (psi[..., si:ei, sj+1:ej+1] - psi[..., si:ei, sj-1:ej-1]) *
+        (vis[..., si+1:ei+1, sj:ej] - vis[..., si-1:ei-1, sj:ej]) +
         
-        (psi[si+1:ei+1, sj:ej]) *
-        (vis[si+1:ei+1, sj+1:ej+1] - vis[si+1:ei+1, sj-1:ej-1]) -
-        (psi[si-1:ei-1, sj:ej]) *
-        (vis[si-1:ei-1, sj+1:ej+1] - vis[si-1:ei-1, sj-1:ej-1]) -
-        (psi[si:ei, sj+1:ej+1]) *
-        (vis[si+1:ei+1, sj+1:ej+1] - vis[si-1:ei-1, sj+1:ej+1]) +
-        (psi[si:ei, sj-1:ej-1]) *
-        (vis[si+1:ei+1, sj-1:ej-1] - vis[si-1:ei-1, sj-1:ej-1]) +
+        (psi[..., si+1:ei+1, sj:ej]) *
+        (vis[..., si+1:ei+1, sj+1:ej+1] - vis[..., si+1:ei+1, sj-1:ej-1]) -
+        (psi[..., si-1:ei-1, sj:ej]) *
+        (vis[..., si-1:ei-1, sj+1:ej+1] - vis[..., si-1:ei-1, sj-1:ej-1]) -
+        (psi[..., si:ei, sj+1:ej+1]) *
+        (vis[..., si+1:ei+1, sj+1:ej+1] - vis[..., si-1:ei-1, sj+1:ej+1]) +
+        (psi[..., si:ei, sj-1:ej-1]) *
+        (vis[..., si+1:ei+1, sj-1:ej-1] - vis[..., si-1:ei-1, sj-1:ej-1]) +
         
-        (vis[si:ei, sj+1:ej+1]) *
-        (psi[si+1:ei+1, sj+1:ej+1] - psi[si-1:ei-1, sj+1:ej+1]) -
-        (vis[si:ei, sj-1:ej-1]) *
-        (psi[si+1:ei+1, sj-1:ej-1] - psi[si-1:ei-1, sj-1:ej-1]) -
-        (vis[si+1:ei+1, sj:ej]) *
-        (psi[si+1:ei+1, sj+1:ej+1] - psi[si+1:ei+1, sj-1:ej-1]) +
-        (vis[si-1:ei-1, sj:ej]) *
-        (psi[si-1:ei-1, sj+1:ej+1] - psi[si-1:ei-1, sj-1:ej-1])
+        (vis[..., si:ei, sj+1:ej+1]) *
+        (psi[..., si+1:ei+1, sj+1:ej+1] - psi[..., si-1:ei-1, sj+1:ej+1]) -
+        (vis[..., si:ei, sj-1:ej-1]) *
+        (psi[..., si+1:ei+1, sj-1:ej-1] - psi[..., si-1:ei-1, sj-1:ej-1]) -
+        (vis[..., si+1:ei+1, sj:ej]) *
+        (psi[..., si+1:ei+1, sj+1:ej+1] - psi[..., si+1:ei+1, sj-1:ej-1]) +
+        (vis[..., si-1:ei-1, sj:ej]) *
+        (psi[..., si-1:ei-1, sj+1:ej+1] - psi[..., si-1:ei-1, sj-1:ej-1])
         ) / 3.
     
     return jaco
@@ -202,7 +266,19 @@ def chi(psi, vis_curr, vis_prev, nx, ny, dx, epsilon, wind_par, vis_par):
     
     return rhs
 
-def relax(rhs, chi_prev, dx, nx, ny, r_coeff, tol, max_count, loop):
+def relax(rhs, chi_prev, dx, nx, ny, r_coeff, tol, max_count, loop,
+          solver='jacobi', cycle='V'):
+    if solver == 'multigrid':
+        return multigrid(rhs, chi_prev, dx, tol, max_count, cycle)
+    elif solver == 'fast_poisson':
+        return fast_poisson(rhs, chi_prev, dx)
+    elif solver != 'jacobi':
+        raise ValueError('solver must be jacobi, multigrid or fast_poisson, '
+                         'not {}'.format(solver))
+    if chi_prev.ndim > 2:
+        return relax_ensemble(rhs, chi_prev, dx, nx, ny, r_coeff, tol,
+                              max_count, loop)
+
     chi = np.copy(chi_prev)
     r = np.zeros_like(chi_prev)
 
@@ -248,22 +324,280 @@ def relax(rhs, chi_prev, dx, nx, ny, r_coeff, tol, max_count, loop):
         
     return (chi, count)
 
-def qg(totaltime, loop=False):
+def relax_ensemble(rhs, chi_prev, dx, nx, ny, r_coeff, tol, max_count, loop):
+    """
+    Jacobi relaxation for a whole ensemble: chi_prev is shaped (nens, nx, ny)
+    (or has more leading axes) and rhs is either the same shape or (nx, ny).
+    Each member is iterated until its own rr is below tol, and converged
+    members are dropped from the array operations, so every member gets
+    the same answer as relax would give it on its own.
+    returns (chi, count) with count the number of iterations for each member
+    """
+    shape = chi_prev.shape
+    chi = np.copy(chi_prev).reshape((-1, nx, ny))
+    rhs = np.broadcast_to(rhs, shape).reshape(chi.shape)
+    nens = chi.shape[0]
+    counts = np.zeros(nens, dtype=int)
+    if loop:
+        for k in range(nens):
+            (chi[k], counts[k]) = relax(rhs[k], chi[k], dx, nx, ny, r_coeff,
+                                        tol, max_count, loop)
+        return (chi.reshape(shape), counts.reshape(shape[:-2]))
+
+    active = np.arange(nens)   # members that haven't converged yet
+    count = 0
+    while (active.size > 0) & (count < max_count):
+        if active.size == nens:
+            chi_a = chi
+            rhs_a = rhs
+        else:
+            chi_a = chi[active]
+            rhs_a = rhs[active]
+        r = np.zeros_like(chi_a)
+        r[:, 1:-1, 1:-1] = rhs_a[:, 1:-1, 1:-1] * dx * dx * 0.25 - (
+            ( chi_a[:, 2:, 1:-1]
+            + chi_a[:, 1:-1, 2:]
+            + chi_a[:, :-2, 1:-1]
+            + chi_a[:, 1:-1, :-2] ) * 0.25
+            - chi_a[:, 1:-1, 1:-1] )
+
+        chi_max = np.maximum(np.max(chi_a, axis=(1, 2)), -np.min(chi_a, axis=(1, 2)))
+        r_max = np.maximum(np.max(r, axis=(1, 2)), -np.min(r, axis=(1, 2)))
+        chi[active] = chi_a - r_coeff * r
+
+        rr = np.full(active.size, 1e50)
+        np.divide(r_max, chi_max, out=rr, where=(chi_max != 0))
+        counts[active] = counts[active] + 1
+        active = active[rr > tol]
+        count = count + 1
+
+    return (chi.reshape(shape), counts.reshape(shape[:-2]))
+
+# Geometric multigrid for the chi equation
+#
+#   (chi[i+1,j] + chi[i-1,j] + chi[i,j+1] + chi[i,j-1] - 4 chi[i,j])/h**2 = rhs
+#
+# with chi held fixed on the boundary.  A fine grid of n points is coarsened
+# to (n-1)/2 + 1 points as long as n-1 is even, and the coarsest grid is solved
+# exactly with a sparse LU factorization that is cached for each grid size.
+# All the functions work on the last two axes, so chi can also be an
+# ensemble shaped (nens, nx, ny).
+
+def laplace_residual(chi, rhs, h):
+    """
+    return rhs - laplacian(chi) on the interior points, zero on the boundary
+    """
+    res = np.zeros_like(chi)
+    res[..., 1:-1, 1:-1] = rhs[..., 1:-1, 1:-1] - (
+        chi[..., 2:, 1:-1] + chi[..., :-2, 1:-1] +
+        chi[..., 1:-1, 2:] + chi[..., 1:-1, :-2]
+        - 4 * chi[..., 1:-1, 1:-1]) / (h * h)
+    return res
+
+def scaled_residual(chi, rhs, dx):
+    """
+    the convergence measure used by relax: max(|residual|)*dx*dx/4
+    relative to max(|chi|), for each member if chi is an ensemble
+    """
+    r_max = np.max(np.abs(laplace_residual(chi, rhs, dx)),
+                   axis=(-2, -1)) * dx * dx * 0.25
+    chi_max = np.max(np.abs(chi), axis=(-2, -1))
+    rr = np.full(np.shape(chi_max), 1e50)
+    np.divide(r_max, chi_max, out=rr, where=(chi_max != 0))
+    if rr.ndim == 0:
+        return float(rr)
+    return rr
+
+def rb_gauss_seidel(chi, rhs, h, sweeps):
+    """
+    red-black Gauss-Seidel sweeps, updating chi in place; all the red
+    points (i+j even) are updated first, then all the black points
+    """
+    n, m = chi.shape[-2:]
+    h2 = h * h
+    for sweep in range(sweeps):
+        for colour in (((1, 1), (2, 2)), ((1, 2), (2, 1))):
+            for si, sj in colour:
+                chi[..., si:n-1:2, sj:m-1:2] = 0.25 * (
+                    chi[..., si-1:n-2:2, sj:m-1:2] + chi[..., si+1:n:2, sj:m-1:2] +
+                    chi[..., si:n-1:2, sj-1:m-2:2] + chi[..., si:n-1:2, sj+1:m:2] -
+                    h2 * rhs[..., si:n-1:2, sj:m-1:2])
+
+def restrict(fine):
+    """
+    full weighting restriction of an n x m array to (n-1)/2+1 x (m-1)/2+1
+    """
+    n, m = fine.shape[-2:]
+    coarse = np.zeros(fine.shape[:-2] + ((n-1)//2 + 1, (m-1)//2 + 1))
+    coarse[..., 1:-1, 1:-1] = (
+        4 * fine[..., 2:-2:2, 2:-2:2] +
+        2 * (fine[..., 1:-3:2, 2:-2:2] + fine[..., 3:-1:2, 2:-2:2] +
+             fine[..., 2:-2:2, 1:-3:2] + fine[..., 2:-2:2, 3:-1:2]) +
+        fine[..., 1:-3:2, 1:-3:2] + fine[..., 3:-1:2, 1:-3:2] +
+        fine[..., 1:-3:2, 3:-1:2] + fine[..., 3:-1:2, 3:-1:2]) / 16.
+    return coarse
+
+def prolong(coarse):
+    """
+    bilinear interpolation of an n x m array to 2(n-1)+1 x 2(m-1)+1
+    """
+    n, m = coarse.shape[-2:]
+    fine = np.zeros(coarse.shape[:-2] + (2*(n-1) + 1, 2*(m-1) + 1))
+    fine[..., ::2, ::2] = coarse
+    fine[..., 1::2, ::2] = 0.5 * (coarse[..., :-1, :] + coarse[..., 1:, :])
+    fine[..., ::2, 1::2] = 0.5 * (coarse[..., :, :-1] + coarse[..., :, 1:])
+    fine[..., 1::2, 1::2] = 0.25 * (coarse[..., :-1, :-1] + coarse[..., 1:, :-1] +
+                                    coarse[..., :-1, 1:] + coarse[..., 1:, 1:])
+    return fine
+
+def coarsens(n, m):
+    return n > 3 and m > 3 and (n-1) % 2 == 0 and (m-1) % 2 == 0
+
+@functools.lru_cache(maxsize=16)
+def coarse_lu(n, m, h):
+    """
+    sparse LU factorization of the 5 point laplacian on the (n-2) x (m-2)
+    interior of the coarsest grid
+    """
+    tn = sparse.diags([1., -2., 1.], [-1, 0, 1], shape=(n-2, n-2))
+    tm = sparse.diags([1., -2., 1.], [-1, 0, 1], shape=(m-2, m-2))
+    lap = (sparse.kron(tn, sparse.identity(m-2)) +
+           sparse.kron(sparse.identity(n-2), tm)) / (h * h)
+    return sparse_linalg.splu(lap.tocsc())
+
+def mg_cycle(chi, rhs, h, gamma, nu1=2, nu2=2):
+    """
+    one multigrid cycle, updating chi in place: gamma=1 is a V-cycle,
+    gamma=2 a W-cycle.  nu1 and nu2 are the number of pre- and post-
+    smoothing sweeps
+    """
+    n, m = chi.shape[-2:]
+    if not coarsens(n, m):
+        # coarsest grid: solve for the correction exactly, with one
+        # right hand side column per ensemble member
+        res = laplace_residual(chi, rhs, h)[..., 1:-1, 1:-1]
+        columns = res.reshape((-1, (n-2)*(m-2))).T
+        chi[..., 1:-1, 1:-1] += coarse_lu(n, m, h).solve(
+            np.ascontiguousarray(columns)).T.reshape(res.shape)
+        return
+    rb_gauss_seidel(chi, rhs, h, nu1)
+    rhs_coarse = restrict(laplace_residual(chi, rhs, h))
+    err_coarse = np.zeros_like(rhs_coarse)
+    for visit in range(gamma):
+        mg_cycle(err_coarse, rhs_coarse, 2*h, gamma, nu1, nu2)
+    chi += prolong(err_coarse)
+    rb_gauss_seidel(chi, rhs, h, nu2)
+
+def multigrid(rhs, chi_prev, dx, tol, max_count, cycle='V'):
+    """
+    solve for chi with multigrid cycles, starting from chi_prev, until the
+    scaled residual used by the Jacobi version of relax is below tol
+    returns (chi, number of cycles).  For an ensemble shaped (nens, nx, ny)
+    each member stops cycling once it has converged, and the number of
+    cycles is returned for each member.
+    """
+    gamma = {'V': 1, 'W': 2}[cycle.upper()]
+    shape = chi_prev.shape
+    chi = np.copy(chi_prev).reshape((-1,) + shape[-2:])
+    rhs = np.broadcast_to(rhs, shape).reshape(chi.shape)
+    counts = np.zeros(chi.shape[0], dtype=int)
+
+    active = np.arange(chi.shape[0])   # members that haven't converged yet
+    count = 0
+    while (active.size > 0) & (count < max_count):
+        chi_a = chi[active]
+        mg_cycle(chi_a, rhs[active], dx, gamma)
+        chi[active] = chi_a
+        rr = scaled_residual(chi_a, rhs[active], dx)
+        counts[active] = counts[active] + 1
+        active = active[rr > tol]
+        count = count + 1
+
+    if len(shape) == 2:
+        return (chi.reshape(shape), int(counts[0]))
+    return (chi.reshape(shape), counts.reshape(shape[:-2]))
+
+# Direct solve of the same equation with a discrete sine transform.  The
+# sine modes sin(pi*k*i/(n-1)) vanish on the boundary and are eigenvectors
+# of the 5 point laplacian, so the solve is a forward DST, a division by the
+# eigenvalues, and an inverse DST.
+
+@functools.lru_cache(maxsize=16)
+def dst_denominators(nx, ny, dx):
+    """
+    eigenvalues of the 5 point laplacian on the (nx-2) x (ny-2) interior,
+    computed once per grid size
+    """
+    lam_x = -4 * np.sin(0.5*np.pi*np.arange(1, nx-1)/(nx-1))**2
+    lam_y = -4 * np.sin(0.5*np.pi*np.arange(1, ny-1)/(ny-1))**2
+    return (lam_x[:, np.newaxis] + lam_y[np.newaxis, :]) / (dx * dx)
+
+def fast_poisson(rhs, chi_prev, dx):
+    """
+    solve for chi exactly, keeping the boundary values of chi_prev, which
+    can be one field or an ensemble shaped (nens, nx, ny)
+    returns (chi, 1) so it can stand in for relax
+    """
+    nx, ny = chi_prev.shape[-2:]
+    res = laplace_residual(chi_prev, rhs, dx)
+    coeffs = sfft.dstn(res[..., 1:-1, 1:-1], type=1, axes=(-2, -1))
+    coeffs /= dst_denominators(nx, ny, dx)
+    chi = np.copy(chi_prev)
+    chi[..., 1:-1, 1:-1] += sfft.idstn(coeffs, type=1, axes=(-2, -1))
+    return (chi, 1)
+
+def check_fast_poisson(rhs, chi_prev, dx, nx, ny, r_coeff, tol, max_count):
+    """
+    solve the same problem with fast_poisson and with the Jacobi relax and
+    report the residual of each and the largest difference between them
+    """
+    (chi_fast, count_fast) = fast_poisson(rhs, chi_prev, dx)
+    (chi_relax, count_relax) = relax(rhs, chi_prev, dx, nx, ny, r_coeff,
+                                     tol, max_count, False)
+    res_fast = scaled_residual(chi_fast, rhs, dx)
+    res_relax = scaled_residual(chi_relax, rhs, dx)
+    diff = np.max(np.abs(chi_fast - chi_relax))
+    print ("fast_poisson residual = ", res_fast)
+    print ("relax residual = ", res_relax, " after ", count_relax, " iterations")
+    print ("max |chi_fast - chi_relax| = ", diff,
+           " relative to max |chi| = ", diff / np.max(np.abs(chi_fast)))
+    return (res_fast, res_relax, diff)
+
+def split_params(params):
+    """
+    split keyword arguments into those for numer_init and those for param
+    """
+    numer_names = ('dt', 'tol', 'maxiter', 'coeff')
+    numer_args = {key: value for key, value in params.items()
+                  if key in numer_names}
+    param_args = {key: value for key, value in params.items()
+                  if key not in numer_names}
+    return (param_args, numer_args)
+
+def qg(totaltime, loop=False, nx=30, solver='jacobi', cycle='V', verbose=True,
+       psi_init=None, **params):
     
-    # initialize the physical parameters
-    (pb, pa, pepsilon, pwind, pvis, ptime) = param()
-    # initialize the numerical parameters
-    (nnx, ndx, nny, ndt, ntol, nmax, ncoeff) = numer_init()
+    # initialize the physical parameters, and the numerical parameters;
+    # params can override any of the arguments of param and numer_init
+    # psi_init is an optional starting psi, either (nx, ny) or an ensemble
+    # shaped (nens, nx, ny) that is stepped forward all at once
+    (param_args, numer_args) = split_params(params)
+    (pb, pa, pepsilon, pwind, pvis, ptime) = param(verbose=verbose, **param_args)
+    (nnx, ndx, nny, ndt, ntol, nmax, ncoeff) = numer_init(nx, verbose=verbose,
+                                                          **numer_args)
 
     # initialize the arrays (need 2 because chi depends on psi at 2 time steps)
-    psi_1 = np.zeros((nnx,nny))
-    psi_2 = np.zeros((nnx,nny))
+    if psi_init is None:
+        psi_1 = np.zeros((nnx,nny))
+    else:
+        psi_1 = np.array(psi_init, dtype=np.float64)
+    psi_2 = np.copy(psi_1)
 
-    vis_prev = np.zeros((nnx,nny))
-    vis_curr = np.zeros((nnx,nny))
+    vis_prev = np.zeros_like(psi_1)
+    vis_curr = np.zeros_like(psi_1)
 
-    chii = np.zeros((nnx,nny))
-    chi_prev = np.zeros((nnx,nny))
+    chii = np.zeros_like(psi_1)
+    chi_prev = np.zeros_like(psi_1)
 
     # non-dimensionalize time
     totaltime = totaltime/ptime
@@ -285,7 +619,8 @@ def qg(totaltime, loop=False):
         
         # find chi, take a step
         rhs = chi(psi_1, vis_curr, vis_prev, nnx, nny, ndx, pepsilon, pwind, pvis)
-        (chii, c) = relax(rhs, chi_prev, ndx, nnx, nny, ncoeff, ntol, nmax, loop)
+        (chii, c) = relax(rhs, chi_prev, ndx, nnx, nny, ncoeff, ntol, nmax, loop,
+                          solver, cycle)
         psi_2 = psi_2 + dt*chii
         chi_prev = chii
         count_total = count_total + c
@@ -296,7 +631,8 @@ def qg(totaltime, loop=False):
         vis_prev = vis_curr
         vis_curr = vis(psi_2, nnx, nny)
         rhs = chi(psi_2, vis_curr, vis_prev, nnx, nny, ndx, pepsilon, pwind, pvis)
-        (chii, c) = relax(rhs, chi_prev, ndx, nnx, nny, ncoeff, ntol, nmax, loop)
+        (chii, c) = relax(rhs, chi_prev, ndx, nnx, nny, ncoeff, ntol, nmax, loop,
+                          solver, cycle)
         psi_1 = psi_1 + dt*chii
         chi_prev = chii
         count_total = count_total + c
@@ -305,11 +641,467 @@ def qg(totaltime, loop=False):
     return psi_1
 
 
+# Loop versions of vis, mybeta and jac for numba.  Each point is computed
+# in one pass with the operations in the same order as the indexing
+# versions above, so the results are bitwise identical.  prange is range
+# unless they are compiled with parallel=True.
+
+def vis_kernel(psi, out):
+    nx, ny = psi.shape
+    for i in prange(1, nx-1):
+        for j in range(1, ny-1):
+            out[i, j] = (psi[i+1, j] + psi[i-1, j] + psi[i, j+1] + psi[i, j-1]
+                         - 4 * psi[i, j])
+
+def beta_kernel(psi, out):
+    nx, ny = psi.shape
+    for i in prange(1, nx-1):
+        for j in range(1, ny-1):
+            out[i, j] = psi[i+1, j] - psi[i-1, j]
+
+def jac_kernel(psi, vis, out):
+    nx, ny = psi.shape
+    for i in prange(1, nx-1):
+        for j in range(1, ny-1):
+            out[i, j] = (
+                (psi[i+1, j] - psi[i-1, j]) * (vis[i, j+1] - vis[i, j-1]) -
+                (psi[i, j+1] - psi[i, j-1]) * (vis[i+1, j] - vis[i-1, j]) +
+                psi[i+1, j] * (vis[i+1, j+1] - vis[i+1, j-1]) -
+                psi[i-1, j] * (vis[i-1, j+1] - vis[i-1, j-1]) -
+                psi[i, j+1] * (vis[i+1, j+1] - vis[i-1, j+1]) +
+                psi[i, j-1] * (vis[i+1, j-1] - vis[i-1, j-1]) +
+                vis[i, j+1] * (psi[i+1, j+1] - psi[i-1, j+1]) -
+                vis[i, j-1] * (psi[i+1, j-1] - psi[i-1, j-1]) -
+                vis[i+1, j] * (psi[i+1, j+1] - psi[i+1, j-1]) +
+                vis[i-1, j] * (psi[i-1, j+1] - psi[i-1, j-1])
+                ) / 3.
+
+@functools.lru_cache(maxsize=2)
+def get_kernels(parallel=False):
+    """
+    return numba compiled (vis_kernel, beta_kernel, jac_kernel), or None
+    if numba isn't installed
+    """
+    if numba is None:
+        return None
+    jit = numba.jit(nopython=True, nogil=True, parallel=parallel)
+    return (jit(vis_kernel), jit(beta_kernel), jit(jac_kernel))
+
+
+class SnapshotWriter:
+    """
+    Write psi/chi snapshots into memory mapped .npy files (time.npy, psi.npy
+    and chi.npy in outdir, with one row per snapshot) and save checkpoints,
+    from a background thread.  The model hands over copies through a
+    bounded queue, so it only waits if it gets more than maxsize items
+    ahead of the disk.
+    """
+
+    def __init__(self, outdir, nsnap, shape, resume=False, maxsize=8):
+        self.outdir = Path(outdir)
+        self.outdir.mkdir(parents=True, exist_ok=True)
+        mode = 'r+' if resume else 'w+'
+        self.time = np.lib.format.open_memmap(
+            self.outdir / 'time.npy', mode=mode, dtype=np.float64,
+            shape=(nsnap,))
+        self.psi = np.lib.format.open_memmap(
+            self.outdir / 'psi.npy', mode=mode, dtype=np.float64,
+            shape=(nsnap,) + shape)
+        self.chi = np.lib.format.open_memmap(
+            self.outdir / 'chi.npy', mode=mode, dtype=np.float64,
+            shape=(nsnap,) + shape)
+        if self.psi.shape != (nsnap,) + shape:
+            raise ValueError('{} holds snapshots of shape {}, expecting {}'.format(
+                self.outdir, self.psi.shape, (nsnap,) + shape))
+        self.error = None
+        self.queue = queue.Queue(maxsize)
+        self.thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.thread.start()
+
+    def snapshot(self, index, t, psi, chi):
+        self.queue.put(('snapshot', index, t, psi.copy(), chi.copy()))
+
+    def checkpoint(self, state):
+        self.queue.put(('checkpoint', state))
+
+    def write_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error is not None:
+                # keep draining so the model never blocks on a full queue
+                continue
+            try:
+                if item[0] == 'snapshot':
+                    (kind, index, t, psi, chi) = item
+                    self.time[index] = t
+                    self.psi[index] = psi
+                    self.chi[index] = chi
+                else:
+                    # make sure the snapshots it refers to are on disk first
+                    self.flush()
+                    save_checkpoint(self.outdir / 'checkpoint.npz', item[1])
+            except Exception as error:
+                self.error = error
+
+    def flush(self):
+        self.time.flush()
+        self.psi.flush()
+        self.chi.flush()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.flush()
+        if self.error is not None:
+            raise self.error
+
+def save_checkpoint(filename, state):
+    """
+    save a dictionary of arrays, writing to a temporary file first so an
+    interrupted write never replaces a good checkpoint
+    """
+    filename = Path(filename)
+    tmpname = filename.with_suffix('.tmp.npz')
+    np.savez(tmpname, **state)
+    os.replace(tmpname, filename)
+
+def load_snapshots(outdir):
+    """
+    return (time, psi, chi) snapshots saved by QGModel.run as read only
+    memory maps; psi and chi are shaped (nsnap, nx, ny)
+    """
+    outdir = Path(outdir)
+    return tuple(np.load(outdir / name, mmap_mode='r')
+                 for name in ('time.npy', 'psi.npy', 'chi.npy'))
+
+
+class QGModel:
+    """
+    Same time stepping as qg(), but the arrays are allocated once in the
+    constructor: psi_1, psi_2, vis_curr, vis_prev, chi, rhs, jacobian,
+    beta and residual, plus three interior scratch arrays.  The wind forcing
+    is computed once, and each stencil is written into its array with
+    out= ufunc arguments.  The operations are done in the same order as
+    in vis, mybeta, jac, chi and relax, so the answers are identical to qg().
+    Only the jacobi solver (with loop=False) is allocation free; the others
+    call the module level solvers.  use_numba=True replaces the vis, mybeta
+    and jac stencils with the compiled kernels (run across cores if
+    parallel=True), falling back to NumPy if numba isn't installed.
+    Any other keyword arguments are passed on to param or numer_init.
+    """
+
+    def __init__(self, nx=30, loop=False, solver='jacobi', cycle='V',
+                 use_numba=False, parallel=False, **params):
+        (param_args, numer_args) = split_params(params)
+        (self.b, self.a, self.epsilon, self.wind_par, self.vis_par,
+         self.time) = param(verbose=False, **param_args)
+        (self.nx, self.dx, self.ny, self.dt, self.tol, self.maxiter,
+         self.coeff) = numer_init(nx, verbose=False, **numer_args)
+        self.loop = loop
+        self.solver = solver
+        self.cycle = cycle
+
+        shape = (self.nx, self.ny)
+        self.psi_1 = np.zeros(shape)
+        self.psi_2 = np.zeros(shape)
+        self.vis_curr = np.zeros(shape)
+        self.vis_prev = np.zeros(shape)
+        self.chi = np.zeros(shape)
+        self.rhs = np.zeros(shape)
+        self.jacobian = np.zeros(shape)
+        self.beta = np.zeros(shape)
+        self.residual = np.zeros(shape)
+        self.work_1 = np.empty((self.nx-2, self.ny-2))
+        self.work_2 = np.empty((self.nx-2, self.ny-2))
+        self.work_3 = np.empty((self.nx-2, self.ny-2))
+
+        # coefficients of the right hand side, in the order chi() uses them
+        d = 1./self.dx
+        self.beta_coeff = -0.5*d
+        self.jac_coeff = self.epsilon*0.25*d*d*d*d
+        self.vis_coeff = self.vis_par*d*d
+        self.wind_term = self.wind_par*0.5*d*wind(self.nx, self.ny)
+
+        self.kernels = None
+        if use_numba:
+            self.kernels = get_kernels(parallel)
+            if self.kernels is None:
+                warnings.warn('numba is not installed, using the NumPy stencils')
+
+        self.t = 0.
+        self.count_total = 0
+        self.nloop = 0
+
+    def vis(self, psi, out):
+        if self.kernels is not None:
+            self.kernels[0](psi, out)
+            return
+        o = out[1:-1, 1:-1]
+        np.add(psi[2:, 1:-1], psi[:-2, 1:-1], out=o)
+        np.add(o, psi[1:-1, 2:], out=o)
+        np.add(o, psi[1:-1, :-2], out=o)
+        np.multiply(4, psi[1:-1, 1:-1], out=self.work_1)
+        np.subtract(o, self.work_1, out=o)
+
+    def mybeta(self, psi, out):
+        if self.kernels is not None:
+            self.kernels[1](psi, out)
+            return
+        np.subtract(psi[2:, 1:-1], psi[:-2, 1:-1], out=out[1:-1, 1:-1])
+
+    def jac(self, psi, vis, out):
+        if self.kernels is not None:
+            self.kernels[2](psi, vis, out)
+            return
+        o = out[1:-1, 1:-1]
+        w1 = self.work_1
+        w2 = self.work_2
+        # centre, east, west, north, south and the four corners
+        p_e = psi[2:, 1:-1]; p_w = psi[:-2, 1:-1]
+        p_n = psi[1:-1, 2:]; p_s = psi[1:-1, :-2]
+        p_ne = psi[2:, 2:]; p_se = psi[2:, :-2]
+        p_nw = psi[:-2, 2:]; p_sw = psi[:-2, :-2]
+        v_e = vis[2:, 1:-1]; v_w = vis[:-2, 1:-1]
+        v_n = vis[1:-1, 2:]; v_s = vis[1:-1, :-2]
+        v_ne = vis[2:, 2:]; v_se = vis[2:, :-2]
+        v_nw = vis[:-2, 2:]; v_sw = vis[:-2, :-2]
+
+        np.subtract(p_e, p_w, out=o)
+        np.subtract(v_n, v_s, out=w1)
+        np.multiply(o, w1, out=o)
+        np.subtract(p_n, p_s, out=w1)
+        np.subtract(v_e, v_w, out=w2)
+        np.multiply(w1, w2, out=w1)
+        np.subtract(o, w1, out=o)
+        # the remaining eight terms are all a*(b - c)
+        terms = ((np.add, p_e, v_ne, v_se), (np.subtract, p_w, v_nw, v_sw),
+                 (np.subtract, p_n, v_ne, v_nw), (np.add, p_s, v_se, v_sw),
+                 (np.add, v_n, p_ne, p_nw), (np.subtract, v_s, p_se, p_sw),
+                 (np.subtract, v_e, p_ne, p_se), (np.add, v_w, p_nw, p_sw))
+        for (op, a, b, c) in terms:
+            np.subtract(b, c, out=w1)
+            np.multiply(a, w1, out=w1)
+            op(o, w1, out=o)
+        np.divide(o, 3., out=o)
+
+    def chi_rhs(self, psi):
+        self.mybeta(psi, self.beta)
+        self.jac(psi, self.vis_curr, self.jacobian)
+        np.multiply(self.beta_coeff, self.beta, out=self.rhs)
+        np.multiply(self.jac_coeff, self.jacobian, out=self.jacobian)
+        np.subtract(self.rhs, self.jacobian, out=self.rhs)
+        np.add(self.rhs, self.wind_term, out=self.rhs)
+        np.multiply(self.vis_coeff, self.vis_prev, out=self.residual)
+        np.subtract(self.rhs, self.residual, out=self.rhs)
+
+    def relax(self):
+        """
+        update self.chi in place, starting from the previous chi
+        """
+        if self.loop or self.solver != 'jacobi':
+            (chi, count) = relax(self.rhs, self.chi, self.dx, self.nx, self.ny,
+                                 self.coeff, self.tol, self.maxiter, self.loop,
+                                 self.solver, self.cycle)
+            self.chi[...] = chi
+            return count
+        dx = self.dx
+        chi = self.chi
+        r = self.residual
+        r[...] = 0.
+        r_i = r[1:-1, 1:-1]
+        chi_i = chi[1:-1, 1:-1]
+        w1 = self.work_1
+        # rhs*dx*dx*0.25 doesn't change during the iteration
+        rhs_scaled = self.work_3
+        np.multiply(self.rhs[1:-1, 1:-1], dx, out=rhs_scaled)
+        np.multiply(rhs_scaled, dx, out=rhs_scaled)
+        np.multiply(rhs_scaled, 0.25, out=rhs_scaled)
+        rr = 1e50
+        count = 0
+        while (rr > self.tol) & (count < self.maxiter):
+            np.add(chi[2:, 1:-1], chi[1:-1, 2:], out=w1)
+            np.add(w1, chi[:-2, 1:-1], out=w1)
+            np.add(w1, chi[1:-1, :-2], out=w1)
+            np.multiply(w1, 0.25, out=w1)
+            np.subtract(w1, chi_i, out=w1)
+            np.subtract(rhs_scaled, w1, out=r_i)
+
+            chi_max = max(np.max(chi), -np.min(chi))
+            r_max = max(np.max(r), -np.min(r))
+            np.multiply(self.coeff, r_i, out=w1)
+            np.subtract(chi_i, w1, out=chi_i)
+
+            if (chi_max==0):
+                rr = 1e50
+            else:
+                rr=r_max / chi_max
+            count = count + 1
+        return count
+
+    def step(self, psi_now, psi_next):
+        """
+        advance psi_next by dt using the tendency computed from psi_now
+        """
+        self.t = self.t + self.dt/self.time
+        self.vis_prev, self.vis_curr = self.vis_curr, self.vis_prev
+        self.vis(psi_now, self.vis_curr)
+        self.chi_rhs(psi_now)
+        self.count_total = self.count_total + self.relax()
+        np.multiply(self.dt/self.time, self.chi[1:-1, 1:-1], out=self.work_1)
+        np.add(psi_next[1:-1, 1:-1], self.work_1, out=psi_next[1:-1, 1:-1])
+
+    def state(self):
+        """
+        copies of everything needed to restart the integration
+        """
+        return {'psi_1': self.psi_1.copy(), 'psi_2': self.psi_2.copy(),
+                'vis_curr': self.vis_curr.copy(),
+                'vis_prev': self.vis_prev.copy(), 'chi': self.chi.copy(),
+                't': self.t, 'count_total': self.count_total,
+                'nloop': self.nloop}
+
+    def set_state(self, state):
+        for name in ('psi_1', 'psi_2', 'vis_curr', 'vis_prev', 'chi'):
+            getattr(self, name)[...] = state[name]
+        self.t = float(state['t'])
+        self.count_total = int(state['count_total'])
+        self.nloop = int(state['nloop'])
+
+    def run(self, totaltime, outdir=None, snapshot_every=10,
+            checkpoint_every=None, resume=False):
+        """
+        integrate for totaltime seconds and return psi_1, like qg()
+
+        If outdir is given, psi_1 and chi are saved every snapshot_every
+        double time steps (see load_snapshots) and, if checkpoint_every is
+        set, the model state is saved to outdir/checkpoint.npz every
+        checkpoint_every double steps.  resume=True restarts from that
+        checkpoint; totaltime has to be the same as in the first run.
+        """
+        totaltime = totaltime/self.time
+        if outdir is None:
+            while (self.t < totaltime):
+                self.step(self.psi_1, self.psi_2)
+                self.step(self.psi_2, self.psi_1)
+                self.nloop = self.nloop + 1
+            return self.psi_1
+
+        if resume:
+            with np.load(Path(outdir) / 'checkpoint.npz') as state:
+                self.set_state(state)
+        # count the double steps in the whole run to size the snapshot files
+        t = 0
+        nloops = 0
+        dt = self.dt/self.time
+        while (t < totaltime):
+            t = t + dt
+            t = t + dt
+            nloops = nloops + 1
+        nsnap = nloops // snapshot_every
+        writer = SnapshotWriter(outdir, nsnap, (self.nx, self.ny), resume)
+        try:
+            while (self.t < totaltime):
+                self.step(self.psi_1, self.psi_2)
+                self.step(self.psi_2, self.psi_1)
+                self.nloop = self.nloop + 1
+                if self.nloop % snapshot_every == 0:
+                    writer.snapshot(self.nloop // snapshot_every - 1,
+                                    self.t*self.time, self.psi_1, self.chi)
+                if checkpoint_every and self.nloop % checkpoint_every == 0:
+                    writer.checkpoint(self.state())
+        finally:
+            writer.close()
+        return self.psi_1
+
+
+def sweep_member(totaltime, model_args, member):
+    """
+    run one member of a parameter sweep, returns (psi_1, seconds)
+    """
+    start = time.perf_counter()
+    psi = QGModel(**model_args, **member).run(totaltime)
+    return (psi, time.perf_counter() - start)
+
+def qg_sweep(param_grid, n_jobs=1, totaltime=86400*10, **model_args):
+    """
+    run QGModel for every combination of parameters in param_grid, which is
+    either a dictionary of lists, e.g. {'epsilon': [...], 'vis': [...]}, or a
+    list of dictionaries.  The keys can be any argument of QGModel, param or
+    numer_init, and model_args are passed to every member.  The members are
+    run n_jobs at a time in separate processes.
+
+    returns (members, psi, seconds): the list of parameter dictionaries,
+    the final psi_1 fields stacked into an (nmembers, nx, ny) array and the
+    wall clock time of each run
+    """
+    if isinstance(param_grid, dict):
+        keys = list(param_grid.keys())
+        members = [dict(zip(keys, values))
+                   for values in itertools.product(*param_grid.values())]
+    else:
+        members = [dict(member) for member in param_grid]
+
+    if n_jobs == 1:
+        results = [sweep_member(totaltime, model_args, member)
+                   for member in members]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            results = list(pool.map(sweep_member,
+                                    [totaltime]*len(members),
+                                    [model_args]*len(members), members))
+    psi = np.stack([result[0] for result in results])
+    seconds = np.array([result[1] for result in results])
+    return (members, psi, seconds)
+
+
+def benchmark(sizes=(30, 129, 513), nsteps=4, solver='jacobi'):
+    """
+    time qg() against QGModel for nsteps double time steps on each grid
+    size, and use tracemalloc to measure the peak memory allocated inside
+    the time loop on top of the arrays that exist before it starts
+    returns a list of (nx, qg seconds/step, QGModel seconds/step,
+    qg peak bytes, QGModel peak bytes)
+    """
+    (pb, pa, pepsilon, pwind, pvis, ptime) = param(verbose=False)
+    (nnx, ndx, nny, ndt, ntol, nmax, ncoeff) = numer_init(verbose=False)
+    totaltime = (2*nsteps - 1)*ndt
+    results = []
+    print ("{:>6} {:>14} {:>14} {:>16} {:>16}".format(
+        'nx', 'qg s/step', 'model s/step', 'qg peak bytes', 'model peak bytes'))
+    for nx in sizes:
+        tracemalloc.start()
+        # qg() allocates its six state arrays before the loop
+        state_bytes = 6 * nx * nx * 8
+        start = time.perf_counter()
+        qg(totaltime, nx=nx, solver=solver, verbose=False)
+        qg_time = (time.perf_counter() - start)/nsteps
+        qg_bytes = tracemalloc.get_traced_memory()[1] - state_bytes
+        tracemalloc.stop()
+
+        model = QGModel(nx, solver=solver)
+        tracemalloc.start()
+        start = time.perf_counter()
+        model.run(totaltime)
+        model_time = (time.perf_counter() - start)/nsteps
+        model_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        print ("{:6d} {:14.4g} {:14.4g} {:16d} {:16d}".format(
+            nx, qg_time, model_time, qg_bytes, model_bytes))
+        results.append((nx, qg_time, model_time, qg_bytes, model_bytes))
+    return results
+
+
 def main(args):
-    if len(args) > 3:
-        print ('Usage: qg n_time loop=False')
+    if len(args) == 2 and args[1] == 'benchmark':
+        benchmark()
+    elif len(args) > 4:
+        print ('Usage: qg n_time loop=False solver=jacobi')
         print ('n_time = time in seconds; default is days = 10*86400')
         print ('loop = whether to loop or index, default = False')
+        print ('solver = jacobi, multigrid or fast_poisson, default = jacobi')
     else:
         if len(args) == 1:
             # Default to 10 days, loop false
@@ -318,7 +1110,8 @@ def main(args):
             psi = qg(float(args[1]))
         else:
             loop = True if args[2].lower() == 'true' else False
-            psi = qg(float(args[1]), loop)
+            solver = args[3] if len(args) == 4 else 'jacobi'
+            psi = qg(float(args[1]), loop, solver=solver)
         fig, ax = plt.subplots(1, 1, figsize=(10,8))
         mesh = ax.contourf(np.transpose(psi), cmap='copper')
         fig.colorbar(mesh)
@@ -0,0 +1,52 @@
+"""
+To run:
+
+pytest numlabs/lab8/test_qg.py
+
+Checks that the numba kernels in qg.py give bitwise the same answers as
+the NumPy stencils vis, mybeta and jac, on their own and through a
+QGModel run.  The tests are skipped if numba isn't installed.
+"""
+
+import numpy as np
+import pytest
+
+from numlabs.lab8 import qg
+
+pytest.importorskip('numba')
+
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_kernels(parallel, nx=65):
+    """
+    compare the numba kernels with vis, mybeta and jac on a random psi
+    """
+    (vis_k, beta_k, jac_k) = qg.get_kernels(parallel)
+    rng = np.random.default_rng(1)
+    psi = rng.standard_normal((nx, nx))
+    visc = qg.vis(psi, nx, nx)
+
+    out = np.zeros_like(psi)
+    vis_k(psi, out)
+    assert np.array_equal(out, visc)
+    out = np.zeros_like(psi)
+    beta_k(psi, out)
+    assert np.array_equal(out, qg.mybeta(psi, nx, nx))
+    out = np.zeros_like(psi)
+    jac_k(psi, visc, out)
+    assert np.array_equal(out, qg.jac(psi, visc, nx, nx))
+
+
+def test_model_numba():
+    """
+    a QGModel run with the numba kernels matches qg() exactly
+    """
+    totaltime = 5*86400.
+    psi = qg.qg(totaltime, verbose=False)
+    model = qg.QGModel(use_numba=True)
+    assert np.array_equal(model.run(totaltime), psi)
+
+
+if __name__ == "__main__":
+    print('testing __file__: {}'.format(__file__))
+    pytest.main([__file__, '-vv'])
@@ -0,0 +1,199 @@
+"""2-d power spectra and their annular averages (lab 9)
+
+ubc_fft is the class used by numeric_notebooks/lab9/fft_2d.py.  Its
+annular_avg calls the module function annular_avg, which bins the
+whole spectrum at once with np.bincount.  The map from pixel to radial
+bin is cached by radial_bins for each (xdim, binwidth), so repeated
+spectra of scenes of the same size only cost the fft.
+
+Example usage from the notebook::
+
+  from numlabs.lab9.fft_2d import ubc_fft
+  output = ubc_fft('a17.nc', 'tau', 0.025)
+  output.power_spectrum()
+  output.annular_avg(5)
+  output.graph_spectrum(kol_offset=2000.)
+
+Example usage from the shell::
+
+  # time annular_avg against the original pixel loop
+  $ python fft_2d.py benchmark
+"""
+import functools
+import math
+import sys
+import time
+import numpy as np
+from numpy import fft
+from matplotlib import pyplot as plt
+
+
+@functools.lru_cache(maxsize=16)
+def radial_bins(xdim, binwidth):
+    """
+    the radial bins of an xdim x xdim power spectrum, with the zero
+    wavenumber in the middle as returned by fft.fftshift
+
+    returns (bin_num, kradial, bin_count): the (xdim*xdim,) bin of each
+    pixel and its radius kradial in pixels, in row major order, and the
+    number of pixels in each bin.  The arrays are read-only, since they
+    are shared between calls
+    """
+    numbins = int(round((math.sqrt(2)*xdim/binwidth), 0) + 1)
+    index = np.arange(1, xdim + 1) - xdim/2
+    kradial = np.sqrt(index[:, np.newaxis]**2 + index[np.newaxis, :]**2).ravel()
+    bin_num = np.floor(kradial/binwidth).astype(np.intp)
+    bin_count = np.bincount(bin_num, minlength=numbins).astype(np.float64)
+    for array in (bin_num, kradial, bin_count):
+        array.flags.writeable = False
+    return (bin_num, kradial, bin_count)
+
+
+def annular_avg(spectral_dens, avg_binwidth):
+    """
+    integrate the 2-d power spectrum around a series of rings
+    of radius kradial and average into a set of 1-dimensional
+    radial bins of width avg_binwidth (in pixels)
+
+    returns (k_bins, avg_spec) for the first xdim/2 bins
+    """
+    xdim = spectral_dens.shape[0]
+    midpoint = int(math.floor(xdim/2))
+    bin_num, kradial, bin_count = radial_bins(xdim, avg_binwidth)
+    avg_spec = np.bincount(bin_num, weights=kradial*spectral_dens.ravel(),
+                           minlength=len(bin_count))
+    filled = bin_count > 0
+    avg_spec[filled] = avg_spec[filled]*avg_binwidth/bin_count[filled]/(4*(math.pi**2))
+    k_bins = np.arange(len(bin_count)) + 1
+    return (k_bins[0:midpoint], avg_spec[0:midpoint])
+
+
+def annular_avg_loop(spectral_dens, avg_binwidth):
+    """
+    the original annular average, looping over every pixel; kept for
+    comparison in benchmark
+    """
+    xdim = spectral_dens.shape[0]
+    midpoint = int(math.floor(xdim/2))
+    numbins = int(round((math.sqrt(2)*xdim/avg_binwidth), 0) + 1)
+    avg_spec = np.zeros(numbins, np.float64)
+    bin_count = np.zeros(numbins, np.float64)
+    for i in range(xdim):
+        for j in range(xdim):
+            kradial = math.sqrt(((i+1)-xdim/2)**2+((j+1)-xdim/2)**2)
+            bin_num = int(math.floor(kradial/avg_binwidth))
+            avg_spec[bin_num] = avg_spec[bin_num] + kradial*spectral_dens[i, j]
+            bin_count[bin_num] += 1
+    for i in range(numbins):
+        if bin_count[i] > 0:
+            avg_spec[i] = avg_spec[i]*avg_binwidth/bin_count[i]/(4*(math.pi**2))
+    k_bins = np.arange(numbins) + 1
+    return (k_bins[0:midpoint], avg_spec[0:midpoint])
+
+
+class ubc_fft:
+
+    def __init__(self, filename, var, scale, data=None):
+        """
+           Input filename, var=variable name,
+           scale= the size of the pixel in km
+
+           Constructer opens the netcdf file, reads the data and
+           saves the twodimensional fft.  If data is given it is used
+           instead of reading the file, and filename only names the scene
+        """
+        if data is None:
+            from netCDF4 import Dataset
+            with Dataset(filename, 'r') as fin:
+                data = fin.variables[var][...]
+        data = data - data.mean()
+        if data.shape[0] != data.shape[1]:
+            raise ValueError('expecting square matrix')
+        self.xdim = data.shape[0]     # size of each row of the array
+        self.midpoint = int(math.floor(self.xdim/2))
+        root, suffix = filename.split('.')
+        self.filename = root
+        self.var = var
+        self.scale = float(scale)
+        self.data = data
+        self.fft_data = fft.fft2(self.data)
+
+    def power_spectrum(self):
+        """
+           calculate the power spectrum for the 2-dimensional field
+        """
+        #
+        # fft_shift moves the zero frequency point to the  middle
+        # of the array
+        #
+        fft_shift = fft.fftshift(self.fft_data)
+        spectral_dens = fft_shift*np.conjugate(fft_shift)/(self.xdim*self.xdim)
+        spectral_dens = spectral_dens.real
+        #
+        # dimensional wavenumbers for 2dim spectrum  (need only the kx
+        # dimensional since image is square
+        #
+        k_vals = np.arange(0, (self.midpoint))+1
+        k_vals = (k_vals-self.midpoint)/(self.xdim*self.scale)
+        self.spectral_dens = spectral_dens
+        self.k_vals = k_vals
+
+    def annular_avg(self, avg_binwidth):
+        """
+         integrate the 2-d power spectrum around a series of rings
+         of radius kradial and average into a set of 1-dimensional
+         radial bins, see annular_avg
+        """
+        self.k_bins, self.avg_spec = annular_avg(self.spectral_dens,
+                                                 avg_binwidth)
+
+    def graph_spectrum(self, kol_slope=-5./3., kol_offset=1.,
+                       title=None):
+        """
+           graph the annular average and compare it to Kolmogorov -5/3
+        """
+        avg_spec = self.avg_spec
+        delta_k = 1./self.scale                # 1./km (1/0.025 for landsat 25 meter pixels)
+        nyquist = delta_k * 0.5
+        knum = self.k_bins * (nyquist/float(len(self.k_bins)))  # k = w/(25m)
+        #
+        # draw the -5/3 line through a give spot
+        #
+        kol = kol_offset*(knum**kol_slope)
+        fig, ax = plt.subplots(1, 1, figsize=(8, 8))
+        ax.loglog(knum, avg_spec, 'r-', label='power')
+        ax.loglog(knum, kol, 'k-', label="$k^{-5/3}$")
+        ax.set(title=title, xlabel='k (1/km)', ylabel='$E_k$')
+        ax.legend()
+        self.plotax = ax
+
+
+def benchmark(sizes=(128, 512, 2048), binwidth=5):
+    """
+    time annular_avg, with and without the cached bins, against
+    annular_avg_loop for random scenes of each size
+    """
+    rng = np.random.default_rng(0)
+    for xdim in sizes:
+        output = ubc_fft('random.nc', 'tau', 0.025,
+                         data=rng.standard_normal((xdim, xdim)))
+        output.power_spectrum()
+        start = time.perf_counter()
+        k_loop, spec_loop = annular_avg_loop(output.spectral_dens, binwidth)
+        loop_time = time.perf_counter() - start
+        radial_bins.cache_clear()
+        start = time.perf_counter()
+        annular_avg(output.spectral_dens, binwidth)
+        first_time = time.perf_counter() - start
+        start = time.perf_counter()
+        k_bins, avg_spec = annular_avg(output.spectral_dens, binwidth)
+        cached_time = time.perf_counter() - start
+        print('{0}x{0}: loop {1:.3g} s, vectorized {2:.3g} s, cached bins '
+              '{3:.3g} s, max difference {4:.3g}'.format(
+                  xdim, loop_time, first_time, cached_time,
+                  np.abs(avg_spec - spec_loop).max()))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'benchmark':
+        benchmark()